@@ -34,7 +34,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "subject", "category", "lecturer", "price", "level", "duration", "active")
+    list_display = ("id", "name", "subject", "category", "lecturer", "price", "level", "duration", "student_count", "active")
     list_filter = ("level", "category", "lecturer")
     search_fields = ("name", "subject", "description")
 
@@ -0,0 +1,85 @@
+from django.db.models import Count, Q
+
+from courses.models import Course
+
+CATALOG_FILTERS = ('lecturer', 'category', 'min_price', 'max_price', 'level')
+
+# (key, giá từ, giá đến) theo VNĐ; None = không giới hạn. Cùng quy tắc với ?min_price=&max_price=
+# (price_range_q): hai đầu đều tính, khóa học có giá đúng bằng mốc thuộc cả hai nhóm kề nhau
+PRICE_BUCKETS = (
+    ('under_500k', None, 500000),
+    ('from_500k_to_1m', 500000, 1000000),
+    ('from_1m_to_2m', 1000000, 2000000),
+    ('over_2m', 2000000, None),
+)
+
+
+def filter_courses(queryset, params, skip=()):
+    """Apply the catalog query parameters to a Course queryset; filters named in skip are ignored."""
+    lecturer_id = params.get('lecturer')
+    category_id = params.get('category')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    level = params.get('level')
+
+    if lecturer_id and 'lecturer' not in skip:
+        queryset = queryset.filter(lecturer_id=lecturer_id)
+
+    if category_id and 'category' not in skip:
+        queryset = queryset.filter(category_id=category_id)
+
+    min_price = min_price if min_price and 'min_price' not in skip else None
+    max_price = max_price if max_price and 'max_price' not in skip else None
+    if min_price is not None or max_price is not None:
+        queryset = queryset.filter(price_range_q(min_price, max_price))
+
+    if level and 'level' not in skip:
+        queryset = queryset.filter(level=level)
+
+    return queryset
+
+
+def price_range_q(min_price, max_price):
+    """Price filter shared by the course list and the price facets: min_price <= price <= max_price."""
+    if min_price is None and max_price is None:
+        return Q()
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lte=max_price)
+    if min_price is None:
+        # Khóa học chưa đặt giá được tính là miễn phí
+        condition |= Q(price__isnull=True)
+    return condition
+
+
+def course_facets(queryset, params):
+    """
+    Counts per category, level and price bucket for the catalog filters in params.
+    Each facet ignores its own filter so the UI can show the alternatives.
+    """
+    categories = filter_courses(queryset, params, skip=('category',)) \
+        .values('category_id', 'category__name').annotate(count=Count('id')).order_by('-count', 'category_id')
+    levels = filter_courses(queryset, params, skip=('level',)) \
+        .values('level').annotate(count=Count('id')).order_by('level')
+    prices = filter_courses(queryset, params, skip=('min_price', 'max_price')).aggregate(**{
+        key: Count('id', filter=price_range_q(min_price, max_price))
+        for key, min_price, max_price in PRICE_BUCKETS
+    })
+    level_labels = dict(Course.Level.choices)
+
+    return {
+        'total': filter_courses(queryset, params).count(),
+        'categories': [
+            {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']} for row in categories
+        ],
+        'levels': [
+            {'value': row['level'], 'label': level_labels.get(row['level'], row['level']), 'count': row['count']}
+            for row in levels
+        ],
+        'price_buckets': [
+            {'key': key, 'min_price': min_price, 'max_price': max_price, 'count': prices[key]}
+            for key, min_price, max_price in PRICE_BUCKETS
+        ],
+    }
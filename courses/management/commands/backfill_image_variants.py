@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course, User
+from courses.services.images import build_variants
+
+# Model -> (cột ảnh, cột lưu biến thể)
+IMAGE_FIELDS = {
+    Course: ('image', 'image_variants'),
+    User: ('avatar', 'avatar_variants'),
+}
+
+
+class Command(BaseCommand):
+    help = "Compute the stored image URL variants of courses and user avatars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help="Recompute rows that already have variants")
+
+    def handle(self, *args, **options):
+        for model, (image_field, variants_field) in IMAGE_FIELDS.items():
+            queryset = model.objects.exclude(**{f'{image_field}__isnull': True}).exclude(**{image_field: ''})
+            if not options['all']:
+                queryset = queryset.filter(**{f'{variants_field}__isnull': True})
+            total = self.backfill(queryset.only('pk', image_field).order_by('pk'), image_field, variants_field,
+                                  options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Updated {total} {model._meta.verbose_name_plural}"))
+
+    def backfill(self, queryset, image_field, variants_field, batch_size):
+        # bulk_update theo lô, không gọi save() nên không kích hoạt signal
+        total, batch = 0, []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            setattr(instance, variants_field, build_variants(instance, image_field))
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                total += self.flush(queryset.model, batch, variants_field)
+        if batch:
+            total += self.flush(queryset.model, batch, variants_field)
+        return total
+
+    def flush(self, model, batch, variants_field):
+        model.objects.bulk_update(batch, [variants_field])
+        count = len(batch)
+        batch.clear()
+        return count
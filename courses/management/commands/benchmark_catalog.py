@@ -0,0 +1,177 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, pre_delete
+
+from courses.filters import filter_courses
+from courses.models import Category, Course, User
+from courses.services import caching, lesson_map, suggest
+from courses.signals import VERSIONED_MODELS
+
+SEED_SUBJECT = 'benchmark-catalog'
+SEED_PREFIX = 'bench_catalog_'
+
+
+@contextmanager
+def muted_delete_signals():
+    """Disconnect every pre/post_delete receiver, so the collector deletes related rows with bulk queries."""
+    saved = [(signal, signal.receivers) for signal in (pre_delete, post_delete)]
+    for signal, _ in saved:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+class Command(BaseCommand):
+    help = ("Seed a large inactive catalog and report EXPLAIN output and timings of the catalog filters "
+            "without/with the composite indexes. Drops indexes: only for DEBUG or throwaway databases")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=50000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--lecturers', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows after the run")
+        parser.add_argument('--force', action='store_true', help="Run even when DEBUG is off")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("benchmark_catalog drops the catalog indexes; run it with DEBUG or pass --force")
+        rng = random.Random(42)
+        try:
+            categories, lecturers = self.seed(rng, options)
+            scenarios = self.scenarios(rng, categories, lecturers)
+            self.drop_indexes()
+            before = self.measure(scenarios, options['repeat'], 'without composite indexes')
+            self.create_indexes()
+            after = self.measure(scenarios, options['repeat'], 'with composite indexes')
+
+            self.stdout.write(self.style.MIGRATE_HEADING("Summary (median ms: page / count)"))
+            for label, _ in scenarios:
+                self.stdout.write(f"  {label:<32} {before[label][0]:>8.2f} / {before[label][1]:<8.2f}"
+                                  f" -> {after[label][0]:>8.2f} / {after[label][1]:.2f}")
+        finally:
+            self.create_indexes()
+            if not options['keep']:
+                self.cleanup(options['batch_size'])
+
+    def seed(self, rng, options):
+        self.stdout.write(f"Seeding {options['courses']} courses...")
+        with transaction.atomic():
+            categories = [Category.objects.create(name=f'{SEED_PREFIX}{i}') for i in range(options['categories'])]
+            lecturers = [
+                User.objects.create(username=f'{SEED_PREFIX}{i}', email=f'{SEED_PREFIX}{i}@example.com')
+                for i in range(options['lecturers'])
+            ]
+            levels = [level for level, _ in Course.Level.choices]
+            batch = []
+            for i in range(options['courses']):
+                batch.append(Course(
+                    category=rng.choice(categories),
+                    lecturer=rng.choice(lecturers),
+                    subject=SEED_SUBJECT,
+                    image='benchmark.png',
+                    name=f'Benchmark course {i}',
+                    price=rng.randrange(0, 5000) * 1000,
+                    level=rng.choice(levels),
+                    # Khóa học giả không bao giờ hiện trên catalog thật
+                    active=False,
+                ))
+                if len(batch) >= options['batch_size']:
+                    Course.objects.bulk_create(batch)
+                    batch = []
+            Course.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {Course._meta.db_table}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+        return categories, lecturers
+
+    def scenarios(self, rng, categories, lecturers):
+        category = rng.choice(categories).pk
+        lecturer = rng.choice(lecturers).pk
+        return [
+            ('no filter', {}),
+            ('category', {'category': category}),
+            ('category + price range', {'category': category, 'min_price': 500000, 'max_price': 1500000}),
+            ('level', {'level': Course.Level.TRUNG_CAP}),
+            ('lecturer', {'lecturer': lecturer}),
+            ('price range', {'min_price': 1000000, 'max_price': 1200000}),
+        ]
+
+    def measure(self, scenarios, repeat, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {title} ==="))
+        results = {}
+        for label, params in scenarios:
+            # Đo trên tập đã seed (active=False): cùng các index (active, ...) như catalog thật
+            queryset = filter_courses(Course.objects.filter(active=False), params).order_by('-created_at')
+            page = queryset[:8]
+
+            page_times, count_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(page.all())
+                page_times.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                queryset.count()
+                count_times.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(page_times), statistics.median(count_times))
+
+            self.stdout.write(self.style.SUCCESS(f"\n-- {label} {params}"))
+            self.stdout.write(page.explain())
+            # Truy vấn chỉ cần pk (như COUNT) nên được phục vụ hoàn toàn từ index
+            self.stdout.write(queryset.order_by().values('pk').explain())
+            self.stdout.write(f"page: {results[label][0]:.2f} ms, count: {results[label][1]:.2f} ms")
+        return results
+
+    def existing_indexes(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Course._meta.db_table))
+
+    def drop_indexes(self):
+        existing = self.existing_indexes()
+        with connection.schema_editor() as editor:
+            for index in Course._meta.indexes:
+                if index.name in existing:
+                    editor.remove_index(Course, index)
+
+    def create_indexes(self):
+        existing = self.existing_indexes()
+        with connection.schema_editor() as editor:
+            for index in Course._meta.indexes:
+                if index.name not in existing:
+                    editor.add_index(Course, index)
+
+    def cleanup(self, batch_size):
+        self.stdout.write("Deleting the seeded rows...")
+        lecturer_ids = list(User.objects.filter(username__startswith=SEED_PREFIX).values_list('pk', flat=True))
+        seeded = Course.objects.filter(subject=SEED_SUBJECT)
+        # Không chạy receiver cho từng khóa học giả: dữ liệu dẫn xuất được làm mới một lần ở dưới
+        with muted_delete_signals():
+            while True:
+                pks = list(seeded.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                with transaction.atomic():
+                    Course.objects.filter(pk__in=pks).delete()
+            with transaction.atomic():
+                Category.objects.filter(name__startswith=SEED_PREFIX).delete()
+                User.objects.filter(username__startswith=SEED_PREFIX).delete()
+
+        # Khóa học giả không active và được bulk_create nên chưa từng vào chỉ mục gợi ý / TeacherStats
+        for name in VERSIONED_MODELS.values():
+            caching.bump_version(name)
+        lesson_map.invalidate()
+        suggest.refresh_items(teacher_ids=lecturer_ids)
@@ -0,0 +1,87 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from courses.models import Chapter, Course, Document, Lesson, User
+from courses.serializers import CourseDetailSerializer, CourseTreeSerializer
+from courses.services.course_tree import load_chapter_nodes
+
+SEED_USERNAME = 'bench_course_tree'
+
+
+class Command(BaseCommand):
+    help = ("Compare round trips and wall time of the prefetch-based course detail with the single-query tree loader "
+            "on a seeded inactive course. Writes to the database: only for DEBUG or throwaway databases")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapters', type=int, default=50)
+        parser.add_argument('--lessons', type=int, default=500, help="Total lessons, spread over the chapters")
+        parser.add_argument('--documents', type=int, default=1, help="Documents per lesson")
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded course after the run")
+        parser.add_argument('--force', action='store_true', help="Run even when DEBUG is off")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("benchmark_course_tree seeds a course with thousands of rows; "
+                               "run it with DEBUG or pass --force")
+        course = self.seed(options)
+        try:
+            old = self.measure("prefetch_related (before)", options['repeat'], lambda: self.prefetch_path(course.pk))
+            new = self.measure("single-query loader (after)", options['repeat'], lambda: self.loader_path(course.pk))
+            same = json.dumps(old, sort_keys=True, default=str) == json.dumps(new, sort_keys=True, default=str)
+            self.stdout.write(f"Identical output: {'yes' if same else 'NO'}")
+        finally:
+            if not options['keep']:
+                with transaction.atomic():
+                    Course.objects.filter(pk=course.pk).delete()
+                    User.objects.filter(username=SEED_USERNAME).delete()
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['chapters']} chapters, {options['lessons']} lessons, "
+                          f"{options['documents']} document(s) per lesson...")
+        with transaction.atomic():
+            lecturer, _ = User.objects.get_or_create(username=SEED_USERNAME,
+                                                     defaults={'email': f'{SEED_USERNAME}@example.com'})
+            course = Course.objects.create(lecturer=lecturer, subject='benchmark', image='benchmark.png',
+                                           name='Benchmark course tree',
+                                           # Khóa học giả không bao giờ hiện trên catalog thật
+                                           active=False)
+            chapters = [Chapter.objects.create(course=course, name=f'Chapter {i}') for i in range(options['chapters'])]
+            for i in range(options['lessons']):
+                lesson = Lesson.objects.create(chapter=chapters[i % len(chapters)], name=f'Lesson {i}',
+                                               description='Lorem ipsum ' * 20, duration=600)
+                for j in range(options['documents']):
+                    Document.objects.create(lesson=lesson, name=f'Document {i}.{j}',
+                                            file_url=f'https://example.com/{i}/{j}.pdf')
+        return course
+
+    def prefetch_path(self, pk):
+        # Đường cũ của get_course_detail: get_object() rồi nạp lại khóa học với prefetch
+        Course.objects.get(pk=pk)
+        course = Course.objects.select_related('lecturer', 'lecturer__userRole').prefetch_related(
+            'chapters__lessons__documents'
+        ).get(pk=pk)
+        return CourseDetailSerializer(course).data
+
+    def loader_path(self, pk):
+        course = Course.objects.select_related('lecturer', 'lecturer__userRole').get(pk=pk)
+        course.chapter_nodes = load_chapter_nodes(pk)
+        return CourseTreeSerializer(course).data
+
+    def measure(self, title, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                data = run()
+                timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(f"  round trips: {len(queries)}")
+        self.stdout.write(f"  median: {statistics.median(timings):.2f} ms, min: {min(timings):.2f} ms")
+        return data
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.services import related
+
+
+class Command(BaseCommand):
+    help = "Rebuild the related courses of every course from co-enrollments (run periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.RELATED_COURSES_TOP_K)
+        parser.add_argument('--min-common', type=int, default=1,
+                            help="Minimum number of shared students for two courses to be related")
+        parser.add_argument('--benchmark', type=int, metavar='ENROLLMENTS',
+                            help="Time the matrix build on synthetic enrollments instead, without touching the DB")
+        parser.add_argument('--courses', type=int, default=5000, help="Synthetic courses for --benchmark")
+        parser.add_argument('--users', type=int, default=200000, help="Synthetic students for --benchmark")
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options)
+
+        start = time.perf_counter()
+        total = related.rebuild_related_courses(top_k=options['top_k'], min_common=options['min_common'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {total} related course pair(s) in {time.perf_counter() - start:.2f}s"))
+
+    def benchmark(self, options):
+        rng = np.random.default_rng(0)
+        size = options['benchmark']
+        # Độ phổ biến của khóa học lệch theo phân phối Zipf như dữ liệu thật
+        popularity = 1.0 / np.arange(1, options['courses'] + 1)
+        course_ids = rng.choice(options['courses'], size=size, p=popularity / popularity.sum()) + 1
+        user_ids = rng.integers(1, options['users'] + 1, size=size)
+        self.stdout.write(f"{size} enrollments, {options['users']} students, {options['courses']} courses")
+
+        start = time.perf_counter()
+        course_values, row, _, _, _ = related.co_enrollment_counts(user_ids, course_ids)
+        matrix_time = time.perf_counter() - start
+        result = related.top_k_similar(user_ids, course_ids, options['top_k'], options['min_common'])
+        total_time = time.perf_counter() - start - matrix_time
+
+        self.stdout.write(f"  co-enrollment matrix: {row.size} non-zero cells in {matrix_time:.2f}s")
+        self.stdout.write(f"  matrix + cosine + top-{options['top_k']}: {result[0].size} pairs "
+                          f"for {np.unique(result[0]).size} courses in {total_time:.2f}s")
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.services import catalog_io
+
+
+class Command(BaseCommand):
+    help = "Stream courses with their chapters, lessons and documents to a JSONL or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help="Output file, '-' for stdout")
+        parser.add_argument('--format', dest='file_format', choices=catalog_io.FORMATS,
+                            help="Default: from the file extension, else jsonl")
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or catalog_io.format_for(options['output'])
+        queryset = Course.objects.filter(active=True) if options['active_only'] else Course.objects.all()
+        records = catalog_io.iter_course_records(queryset, chunk_size=options['chunk_size'])
+
+        to_stdout = options['output'] == '-'
+        output = sys.stdout if to_stdout else open(options['output'], 'w', encoding='utf-8', newline='')
+        try:
+            for line in catalog_io.export_lines(records, file_format):
+                output.write(line)
+        finally:
+            if not to_stdout:
+                output.close()
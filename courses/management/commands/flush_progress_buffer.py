@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.services import progress_buffer
+
+
+class Command(BaseCommand):
+    help = "Write buffered progress heartbeats to the database (loops every --interval seconds unless --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.PROGRESS_FLUSH_INTERVAL)
+        parser.add_argument('--once', action='store_true', help="Flush a single time and exit")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if progress_buffer.get_buffer() is None:
+            # Thoát với mã 0 để pm2 (stop_exit_codes) không khởi động lại liên tục khi chưa cấu hình REDIS_URL
+            self.stdout.write(self.style.WARNING("PROGRESS_WRITE_BEHIND is not enabled, nothing to flush"))
+            return
+        while True:
+            started = time.monotonic()
+            users, lessons = progress_buffer.flush(batch_size=options['batch_size'])
+            if users or options['once']:
+                self.stdout.write(f"Flushed {lessons} lesson progress row(s) of {users} user(s)")
+            if options['once']:
+                return
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
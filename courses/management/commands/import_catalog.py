@@ -0,0 +1,42 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from courses.services import catalog_io
+
+
+class Command(BaseCommand):
+    help = "Import courses with their chapters, lessons and documents from a JSONL or CSV file in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input')
+        parser.add_argument('--format', dest='file_format', choices=catalog_io.FORMATS,
+                            help="Default: from the file extension, else jsonl")
+        parser.add_argument('--batch-size', type=int, default=100, help="Courses per transaction")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <input>.checkpoint)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or catalog_io.format_for(options['input'])
+        checkpoint_path = options['checkpoint'] or f"{options['input']}.checkpoint"
+        checkpoint = None if options['restart'] else catalog_io.read_checkpoint(checkpoint_path)
+        skip = checkpoint['records'] if checkpoint else 0
+        if skip:
+            self.stdout.write(f"Resuming after {skip} record(s) from {checkpoint_path}")
+
+        def on_batch(stats):
+            catalog_io.write_checkpoint(checkpoint_path, stats)
+            self.stdout.write(f"{stats.records} record(s), {stats.courses} course(s), {stats.rows} row(s), "
+                              f"{stats.rows_per_second:.0f} rows/s")
+
+        importer = catalog_io.CatalogImporter(batch_size=options['batch_size'])
+        with open(options['input'], encoding='utf-8', newline='') as f:
+            stats = importer.run(catalog_io.read_records(f, file_format), skip=skip, on_batch=on_batch)
+
+        for error in stats.errors:
+            self.stderr.write(f"{error['ref']}: {error['detail']}")
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats.courses} course(s), {stats.rows} row(s) at {stats.rows_per_second:.0f} rows/s; "
+            f"{stats.skipped} already imported, {stats.failed} error(s)"))
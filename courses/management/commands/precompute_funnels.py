@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.services import caching
+from courses.services.funnel import precompute_funnels
+
+
+class Command(BaseCommand):
+    help = "Precompute the lesson completion funnel of large courses (run nightly, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-learners', type=int,
+                            help="Only courses with at least this many paid learners "
+                                 "(default: FUNNEL_PRECOMPUTE_MIN_LEARNERS)")
+
+    def handle(self, *args, **options):
+        if not caching.is_shared_cache():
+            # Phễu lưu trong cache của process cron, web worker không bao giờ đọc được
+            raise CommandError("The default cache is process-local; set REDIS_URL so the web workers see the funnels")
+        total = precompute_funnels(options['min_learners'])
+        self.stdout.write(self.style.SUCCESS(f"Precomputed the funnel of {total} course(s)"))
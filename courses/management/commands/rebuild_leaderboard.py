@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.services import caching, leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached top-courses rankings (run periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', choices=list(leaderboard.WINDOWS), action='append',
+                            help="Window to rebuild (repeatable, default: all windows)")
+
+    def handle(self, *args, **options):
+        if not caching.is_shared_cache():
+            # Bảng dựng trong cache của process này, web worker không bao giờ đọc được
+            raise CommandError("The default cache is process-local; set REDIS_URL so the web workers see the rankings")
+        rankings = leaderboard.rebuild(options['window'] or tuple(leaderboard.WINDOWS))
+        for window, ranking in rankings.items():
+            self.stdout.write(f"{window}: {len(ranking)} course(s)")
+        self.stdout.write(self.style.SUCCESS("Leaderboard rebuilt"))
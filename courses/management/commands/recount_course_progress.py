@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from courses.services.course_totals import rebuild_course_totals, refresh_course_totals
+from courses.services.progress import recount_course_progress
+
+
+class Command(BaseCommand):
+    help = "Recompute course lesson totals and CourseProgress counters (repair after manual data changes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help="Course id (repeatable, default: all)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Số bài học đã xuất bản của khóa học là mẫu số của phần trăm: tính lại trước
+        if options['course']:
+            refresh_course_totals(options['course'])
+        else:
+            rebuild_course_totals(batch_size=options['batch_size'])
+        total = recount_course_progress(options['course'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted {total} course progress row(s)"))
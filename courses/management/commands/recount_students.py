@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from courses.services.enrollment import recount_students
+from courses.services.teacher_stats import rebuild_teacher_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized student counters on Course from UserCourse, then the teacher stats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = recount_students(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted students for {total} course(s)"))
+        teachers = rebuild_teacher_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {teachers} teacher(s)"))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 20:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STATUS_COUNTER_FIELDS = {
+    'PENDING': 'pending_student_count',
+    'IN_PROGRESS': 'in_progress_student_count',
+    'COMPLETE': 'complete_student_count',
+}
+
+
+def backfill_student_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    UserCourse = apps.get_model('courses', 'UserCourse')
+
+    counts = {}
+    for row in UserCourse.objects.values('course_id', 'status').annotate(total=Count('id')).order_by():
+        course_counts = counts.setdefault(row['course_id'], {'student_count': 0})
+        course_counts['student_count'] += row['total']
+        field = STATUS_COUNTER_FIELDS.get(row['status'])
+        if field:
+            course_counts[field] = course_counts.get(field, 0) + row['total']
+
+    for course_id, course_counts in counts.items():
+        Course.objects.filter(pk=course_id).update(**course_counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_alter_comment_options_alter_comment_forum_topic_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='complete_student_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='in_progress_student_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='pending_student_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='student_count',
+            field=models.IntegerField(default=0, help_text='Total number of enrollments'),
+        ),
+        migrations.RunPython(backfill_student_counters, migrations.RunPython.noop),
+    ]
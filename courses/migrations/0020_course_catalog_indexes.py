@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_course_student_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['active', 'category', 'price'], name='course_active_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['active', 'level', 'created_at'], name='course_active_level_ct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['active', 'lecturer', 'created_at'], name='course_active_lect_ct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['active', 'price'], name='course_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['active', 'created_at'], name='course_active_created_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-17 20:51
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+FULLTEXT_INDEX = 'course_search_text_ft_idx'
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+# Bản sao courses.search.fold_text lúc tạo migration: migration không phụ thuộc code ứng dụng về sau
+def fold_text(text):
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text) if not unicodedata.combining(ch))
+    return ' '.join(_NON_WORD.sub(' ', text.lower()).split())
+
+
+def backfill_search_text(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    courses = list(Course.objects.only('id', 'name', 'subject', 'description'))
+    for course in courses:
+        course.search_text = fold_text(' '.join([course.name or '', course.subject or '',
+                                                strip_tags(course.description or '')]))
+    Course.objects.bulk_update(courses, ['search_text'], batch_size=500)
+
+
+def add_fulltext_index(apps, schema_editor):
+    # Django không có FULLTEXT index, chỉ tạo trên MySQL; backend khác dùng SimpleSearchBackend
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON courses_course (search_text)')
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(f'DROP INDEX {FULLTEXT_INDEX} ON courses_course')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0020_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
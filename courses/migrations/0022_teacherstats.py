@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-17 20:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_teacher_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    TeacherStats = apps.get_model('courses', 'TeacherStats')
+    rows = Course.objects.filter(active=True, lecturer__isnull=False).values('lecturer_id') \
+        .annotate(course_count=models.Count('id'), student_count=models.Sum('student_count'),
+                  average_price=models.Avg('price')) \
+        .order_by()
+    TeacherStats.objects.bulk_create([
+        TeacherStats(teacher_id=row['lecturer_id'], course_count=row['course_count'],
+                     student_count=row['student_count'] or 0, average_price=round(row['average_price'] or 0, 2))
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0021_course_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherStats',
+            fields=[
+                ('teacher', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='teacher_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('course_count', models.IntegerField(default=0)),
+                ('student_count', models.IntegerField(default=0)),
+                ('average_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_teacher_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0023_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='import_ref',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
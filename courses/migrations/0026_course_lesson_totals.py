@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+PUBLISHED = models.Q(is_published=True, active=True, chapter__is_published=True, chapter__active=True)
+
+
+def backfill_lesson_totals(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+    CourseProgress = apps.get_model('courses', 'CourseProgress')
+
+    rows = Lesson.objects.filter(PUBLISHED).values('chapter__course_id') \
+        .annotate(count=models.Count('id'), duration=models.Sum('duration')).order_by()
+    totals = {row['chapter__course_id']: (row['count'], row['duration'] or 0) for row in rows}
+    Course.objects.bulk_update([
+        Course(pk=course_id, published_lesson_count=count, total_duration=duration)
+        for course_id, (count, duration) in totals.items() if course_id
+    ], ['published_lesson_count', 'total_duration'], batch_size=500)
+
+    # total_lessons trước đây là số LessonProgress của user: tính lại theo số bài học đã xuất bản
+    completed = LessonProgress.objects.filter(status='COMPLETED', lesson__is_published=True, lesson__active=True,
+                                              lesson__chapter__is_published=True, lesson__chapter__active=True) \
+        .values('user_id', 'lesson__chapter__course_id').annotate(count=models.Count('id')).order_by()
+    completed = {(row['user_id'], row['lesson__chapter__course_id']): row['count'] for row in completed}
+    progresses = []
+    for progress in CourseProgress.objects.only('pk', 'user_id', 'course_id').iterator(chunk_size=500):
+        total = totals.get(progress.course_id, (0, 0))[0]
+        progress.total_lessons = total
+        progress.completed_lessons = completed.get((progress.user_id, progress.course_id), 0)
+        progress.completion_percentage = progress.completed_lessons / total * 100 if total else 0
+        progresses.append(progress)
+    CourseProgress.objects.bulk_update(progresses, ['total_lessons', 'completed_lessons', 'completion_percentage'],
+                                       batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0025_relatedcourse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='published_lesson_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_duration',
+            field=models.IntegerField(default=0, help_text="Sum of the published lessons' durations"),
+        ),
+        migrations.RunPython(backfill_lesson_totals, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from cloudinary.models import CloudinaryField
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
 
 
 class CourseStatus(models.TextChoices):
@@ -37,6 +40,8 @@ class Role(BaseModel):
 
 class User(AbstractUser):
     avatar = CloudinaryField(null=True, blank=True)
+    # URL các biến thể của avatar (courses/services/images.py)
+    avatar_variants = models.JSONField(null=True, blank=True, editable=False)
     address = models.CharField(max_length=100, null=True, blank=True)
     phone = models.CharField(max_length=15, null=True, blank=True)
     email = models.EmailField(unique=True)
@@ -74,6 +79,7 @@ class Course(BaseModel):
     lecturer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="lectures", null=True, blank=True)
     subject = models.CharField(max_length=255)
     image = CloudinaryField()
+    image_variants = models.JSONField(null=True, blank=True, editable=False)
     name = models.CharField(max_length=255, default='')
     description = models.TextField(default='')
     thumbnail_url = models.URLField(null=True, blank=True)
@@ -87,16 +93,82 @@ class Course(BaseModel):
     duration = models.IntegerField(help_text="Duration in minutes", default=0)
     learning_outcomes = models.TextField(default='', help_text="Learning outcomes in HTML format")
     requirements = models.TextField(default='', help_text="Course requirements in HTML format")
+    # Bộ đếm học viên, được cập nhật cùng transaction với UserCourse (xem courses/signals.py)
+    student_count = models.IntegerField(default=0, help_text="Total number of enrollments")
+    pending_student_count = models.IntegerField(default=0)
+    in_progress_student_count = models.IntegerField(default=0)
+    complete_student_count = models.IntegerField(default=0)
+    # Bài học được tính vào tiến độ (xem published_lessons_q), cập nhật bởi signal của Lesson / Chapter
+    published_lesson_count = models.IntegerField(default=0)
+    total_duration = models.IntegerField(default=0, help_text="Sum of the published lessons' durations")
+    # Tên + môn học + mô tả đã bỏ dấu, có FULLTEXT index trên MySQL (xem courses/search.py)
+    search_text = models.TextField(default='', blank=True, editable=False)
+    # Mã khóa học trong file import (courses/services/catalog_io.py), dùng để import lại không bị trùng
+    import_ref = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    class Meta:
+        # Phục vụ các tổ hợp bộ lọc của CourseViewSet (xem courses/filters.py)
+        indexes = [
+            models.Index(fields=['active', 'category', 'price'], name='course_active_cat_price_idx'),
+            models.Index(fields=['active', 'level', 'created_at'], name='course_active_level_ct_idx'),
+            models.Index(fields=['active', 'lecturer', 'created_at'], name='course_active_lect_ct_idx'),
+            models.Index(fields=['active', 'price'], name='course_active_price_idx'),
+            models.Index(fields=['active', 'created_at'], name='course_active_created_idx'),
+        ]
+
+    # Chỉ được thay đổi bằng UPDATE với F() / update(): giá trị trên instance đã nạp có thể đã cũ
+    COUNTER_FIELDS = ('student_count', 'pending_student_count', 'in_progress_student_count',
+                      'complete_student_count', 'published_lesson_count', 'total_duration')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Lưu khóa học đã có: không ghi đè bộ đếm bằng giá trị lúc nạp instance
+        if not args and not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                                       and field.attname not in deferred]
+        super().save(*args, **kwargs)
+
 
 class UserCourse(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_course")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="user_course")
     status = models.CharField(max_length=20, default=CourseStatus.PENDING, choices=CourseStatus.choices)
 
+    def save(self, *args, **kwargs):
+        # Signal cập nhật bộ đếm trên Course chạy trong cùng transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class TeacherStats(models.Model):
+    """Số liệu tổng hợp của giảng viên, cập nhật khi Course / UserCourse thay đổi (xem courses/signals.py)"""
+    teacher = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='teacher_stats')
+    course_count = models.IntegerField(default=0)
+    student_count = models.IntegerField(default=0)
+    average_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class RelatedCourse(models.Model):
+    """Top-K khóa học tương tự theo đăng ký chung, tính lại bởi lệnh build_related_courses"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='related_courses')
+    related = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['course', 'rank']
+        unique_together = ['course', 'rank']
+
 
 class Chapter(BaseModel):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="chapters", null=True, blank=True)
@@ -115,6 +187,12 @@ class Lesson(BaseModel):
     is_published = models.BooleanField(default=False)
 
 
+def published_lessons_q(prefix=''):
+    """Lessons counted in course totals and progress: published and active, in a published and active chapter."""
+    return Q(**{f'{prefix}{name}': True for name in ('is_published', 'active', 'chapter__is_published',
+                                                      'chapter__active')})
+
+
 class Document(BaseModel):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="documents")
     name = models.CharField(max_length=255, default='')
@@ -155,6 +233,15 @@ class LessonProgress(BaseModel):
     def __str__(self):
         return f"{self.user.username} - {self.lesson.name} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        # Signal cập nhật CourseProgress chạy trong cùng transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
 
 class CourseProgress(BaseModel):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress')
@@ -173,21 +260,47 @@ class CourseProgress(BaseModel):
         return f"{self.user.username} - {self.course.name} - {self.completion_percentage}%"
 
     def update_progress(self):
-        """Update course progress based on lesson progress"""
-        lesson_progresses = LessonProgress.objects.filter(
-            user=self.user,
-            lesson__chapter__course=self.course
-        )
-
-        self.total_lessons = lesson_progresses.count()
-        self.completed_lessons = lesson_progresses.filter(status=LessonProgressStatus.COMPLETED).count()
-        self.total_watch_time = sum(lp.watch_time for lp in lesson_progresses)
-
-        if self.total_lessons > 0:
-            self.completion_percentage = (self.completed_lessons / self.total_lessons) * 100
+        """Update course progress based on lesson progress (full recount, used to repair the counters)"""
+        totals = LessonProgress.objects.filter(user_id=self.user_id, lesson__chapter__course_id=self.course_id) \
+            .aggregate(completed=Count('id', filter=Q(status=LessonProgressStatus.COMPLETED)
+                                       & published_lessons_q('lesson__')),
+                       watch_time=Sum('watch_time'))
+
+        self.total_lessons = Course.objects.filter(pk=self.course_id) \
+            .values_list('published_lesson_count', flat=True).first() or 0
+        self.completed_lessons = totals['completed']
+        self.total_watch_time = totals['watch_time'] or 0
+        self.completion_percentage = (self.completed_lessons / self.total_lessons) * 100 if self.total_lessons else 0
 
         self.save()
 
+    @classmethod
+    def apply_lesson_delta(cls, user_id, course_id, completed=0, watch_time=0):
+        """Apply the change of one LessonProgress with a single UPDATE. Returns False if the row does not exist."""
+        done = F('completed_lessons') + completed
+        # MySQL gán SET từ trái sang phải với giá trị mới: phần trăm phải được tính trước cột đếm
+        return cls.objects.filter(user_id=user_id, course_id=course_id).update(
+            completion_percentage=Case(
+                When(total_lessons__gt=0, then=Cast(done, FloatField()) * 100 / F('total_lessons')),
+                default=Value(0.0), output_field=FloatField(),
+            ),
+            completed_lessons=done,
+            total_watch_time=F('total_watch_time') + watch_time,
+            # Mốc so với LessonProgress.updated_at để phát hiện bộ đếm bị lệch
+            updated_at=timezone.now(),
+        ) > 0
+
+    @classmethod
+    def apply_course_total(cls, course_id, total_lessons):
+        """Set the lesson total of every learner of the course and rescale the percentages with one UPDATE."""
+        if total_lessons:
+            percentage = Cast(F('completed_lessons'), FloatField()) * 100 / total_lessons
+        else:
+            percentage = Value(0.0)
+        return cls.objects.filter(course_id=course_id).update(total_lessons=total_lessons,
+                                                             completion_percentage=percentage,
+                                                             updated_at=timezone.now())
+
 
 class Forum(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CoursePagination(PageNumberPagination):
@@ -8,4 +16,110 @@ class ChapterPagination(PageNumberPagination):
     page_size = 6
 
 class LessonPagination(PageNumberPagination):
-    page_size = 8
\ No newline at end of file
+    page_size = 8
+
+class TeacherPagination(PageNumberPagination):
+    page_size = 12
+
+
+class CourseCursorPagination(BasePagination):
+    """
+    Keyset pagination on (field, id): no OFFSET scan and no COUNT(*) unless ?with_count=true.
+    NULL values are treated as the smallest ones, matching MySQL's default ordering.
+    """
+    page_size = 8
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    count_query_param = 'with_count'
+    orderings = ('-created_at', 'created_at', 'price', '-price')
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.count = queryset.count() if request.query_params.get(self.count_query_param) == 'true' else None
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor:
+            self.ordering, position, reverse = cursor
+        else:
+            ordering = request.query_params.get(self.ordering_query_param)
+            self.ordering = ordering if ordering in self.orderings else self.default_ordering
+            position, reverse = None, False
+
+        field = self.ordering.lstrip('-')
+        # Trang trước: duyệt ngược thứ tự rồi đảo kết quả lại
+        descending = self.ordering.startswith('-') != reverse
+        if descending:
+            queryset = queryset.order_by(F(field).desc(nulls_last=True), '-pk')
+        else:
+            queryset = queryset.order_by(F(field).asc(nulls_first=True), 'pk')
+        if position is not None:
+            queryset = queryset.filter(self._after(field, *position, descending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def _after(self, field, value, pk, descending):
+        if value is None:
+            if descending:
+                return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+            return Q(**{f'{field}__isnull': True, 'pk__gt': pk}) | Q(**{f'{field}__isnull': False})
+        if descending:
+            return (Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                    | Q(**{f'{field}__isnull': True}))
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            ordering = data['o']
+            if ordering not in self.orderings:
+                raise ValueError(ordering)
+            value = data['v']
+            if value is not None:
+                value = model._meta.get_field(ordering.lstrip('-')).to_python(value)
+            return ordering, (value, int(data['pk'])), bool(data.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.ordering.lstrip('-'))
+        data = {'o': self.ordering, 'v': None if value is None else str(value), 'pk': instance.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, self.ordering_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+            payload.move_to_end('count', last=False)
+        return Response(payload)
@@ -20,3 +20,9 @@ class IsTeacherOrAdmin(permissions.IsAuthenticated):
     def has_permission(self, request, view):
         return super().has_permission(request,
                                       view) and (request.user.userRole.name == 'teacher' or request.user.userRole.name == 'admin')
+
+
+class IsCourseLecturerOrAdmin(IsTeacherOrAdmin):
+    """Admins, or the teacher who owns the course."""
+    def has_object_permission(self, request, view, obj):
+        return request.user.userRole.name == 'admin' or obj.lecturer_id == request.user.id
@@ -0,0 +1,86 @@
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def fold_text(text):
+    """Lowercase, strip Vietnamese diacritics and punctuation: 'Lập trình Đồ họa!' -> 'lap trinh do hoa'."""
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text) if not unicodedata.combining(ch))
+    return ' '.join(_NON_WORD.sub(' ', text.lower()).split())
+
+
+def build_search_text(course):
+    return fold_text(' '.join([course.name or '', course.subject or '', strip_tags(course.description or '')]))
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    def search(self, queryset, query):
+        """Return the matching courses annotated with `relevance`, best first."""
+
+
+class MySQLFullTextBackend(SearchBackend):
+    """
+    MATCH ... AGAINST over the FULLTEXT index on Course.search_text.
+    Vietnamese syllables are often two letters: set innodb_ft_min_token_size = 2 on the server.
+    """
+
+    def search(self, queryset, query):
+        folded = fold_text(query)
+        if not folded:
+            return queryset.none()
+        column = f'{queryset.model._meta.db_table}.search_text'
+        relevance = RawSQL(f'MATCH({column}) AGAINST (%s IN NATURAL LANGUAGE MODE)', (folded,))
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', '-pk')
+
+
+class SimpleSearchBackend(SearchBackend):
+    """In-process fallback (SQLite, tests): every term must match, hits in name > subject > description."""
+
+    def search(self, queryset, query):
+        terms = fold_text(query).split()
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(search_text__contains=term)
+
+        scores = {}
+        for pk, name, subject in queryset.values_list('pk', 'name', 'subject'):
+            name, subject = fold_text(name), fold_text(subject)
+            scores[pk] = sum(1 + 3 * (term in name) + 2 * (term in subject) for term in terms)
+        if not scores:
+            return queryset.none()
+
+        relevance = Case(*[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+                         output_field=IntegerField())
+        return queryset.filter(pk__in=scores).annotate(relevance=relevance).order_by('-relevance', '-pk')
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'COURSE_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'mysql':
+            _backend = MySQLFullTextBackend()
+        else:
+            _backend = SimpleSearchBackend()
+    return _backend
+
+
+def search_courses(queryset, query):
+    return get_search_backend().search(queryset, query)
@@ -2,6 +2,8 @@ from courses.models import Category, Course, User, UserCourse, Forum, Comment, C
     LessonProgress, CourseProgress, LessonProgressStatus, Topic
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import FieldDoesNotExist
+from courses.services.images import variant_url
 import cloudinary
 import cloudinary.uploader
 
@@ -30,6 +32,83 @@ class BaseSerializer(serializers.ModelSerializer):
         return validated_data
 
 
+class SparseFieldsMixin:
+    """
+    ?fields=a,b / ?omit=c on the request in the serializer context keep only the chosen fields.
+    sparse_sources maps fields whose columns cannot be derived from their source (SerializerMethodField...).
+    """
+    sparse_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse = False
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        fields = request.query_params.get('fields')
+        omit = request.query_params.get('omit')
+        selected = set(self.fields)
+        if fields:
+            selected &= {name.strip() for name in fields.split(',')}
+        if omit:
+            selected -= {name.strip() for name in omit.split(',')}
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+        self.sparse = bool(fields or omit)
+
+    def sparse_columns(self):
+        """Columns for queryset.only() covering the selected fields, None when no narrowing is possible."""
+        if not self.sparse:
+            return None
+        model = self.Meta.model
+        columns = {model._meta.pk.name}
+        for name, field in self.fields.items():
+            if name in self.sparse_sources:
+                columns.update(self.sparse_sources[name])
+            elif field.source == '*':
+                return None
+            else:
+                column = _model_column(model, field.source.split('.'))
+                if column:
+                    columns.add(column)
+        # only() cần cả khóa ngoại của các quan hệ được select_related
+        for column in list(columns):
+            parts = column.split('__')
+            columns.update('__'.join(parts[:i]) for i in range(1, len(parts)))
+        return columns
+
+
+def _model_column(model, path):
+    """Map a serializer source ('lesson.name', 'course.image.url') to an only() lookup ('lesson__name')."""
+    parts = []
+    for attr in path:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if field.auto_created and not field.concrete:
+            # Quan hệ ngược (chapters...) được nạp bằng truy vấn riêng
+            return None
+        parts.append(attr)
+        if not field.is_relation:
+            break
+        model = field.related_model
+    return '__'.join(parts) or None
+
+
+def sparse_queryset(queryset, serializer, extra=()):
+    """
+    Narrow queryset to the columns of a SparseFieldsMixin serializer, select_related-ing what it reads.
+    extra: columns the caller reads itself.
+    """
+    columns = serializer.sparse_columns()
+    if columns is None:
+        return queryset
+    related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+    return queryset.select_related(None).select_related(*related).only(*columns, *extra)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -37,28 +116,40 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class TeacherSerializer(serializers.ModelSerializer):
+    # Lấy từ TeacherStats (annotate trong TeacherViewSet)
+    course_count = serializers.IntegerField(read_only=True)
+    total_students = serializers.IntegerField(read_only=True)
+    average_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name']
+        fields = ['id', 'first_name', 'last_name', 'course_count', 'total_students', 'average_price']
 
 
 class ItemSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
 
-        data['image'] = instance.image.url
+        if 'image' in self.fields:
+            data['image'] = variant_url(instance.image_variants, 'full', instance.image)
 
         return data
 
 
-class CourseSerializer(ItemSerializer):
+class CourseSerializer(SparseFieldsMixin, ItemSerializer):
+    sparse_sources = {
+        'lecturer_name': ('lecturer__first_name', 'lecturer__last_name'),
+        'category_name': ('category__name',),
+        'total_student': ('student_count',),
+        'image': ('image', 'image_variants'),
+    }
     lecturer_name = serializers.SerializerMethodField(read_only=True)
     category_name = serializers.SerializerMethodField(read_only=True)
     total_student = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Course
-        fields = ['id', 'subject', 'image', 'category', 'category_name', 'total_student', 'lecturer', 'lecturer_name',
+        fields = ['id', 'subject', 'image', 'image_variants', 'category', 'category_name', 'total_student', 'lecturer', 'lecturer_name',
                   'name', 'description', 'video_url', 'price', 'level', 'duration',
                   'created_at']
 
@@ -66,7 +157,7 @@ class CourseSerializer(ItemSerializer):
         return obj.lecturer.last_name + " " + obj.lecturer.first_name
 
     def get_total_student(self, obj):
-        return obj.user_course.count()
+        return obj.student_count
 
     def get_category_name(self, obj):
         return obj.category.name
@@ -159,7 +250,7 @@ class UserSerializer(BaseSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name',
-                  'avatar', 'address', 'introduce', 'phone', 'date_joined', 'userRole', 'is_active')
+                  'avatar', 'avatar_variants', 'address', 'introduce', 'phone', 'date_joined', 'userRole', 'is_active')
         read_only_fields = ('id', 'date_joined')
 
     def get_userRole(self, obj):
@@ -169,12 +260,7 @@ class UserSerializer(BaseSerializer):
         return obj.date_joined.strftime("%d-%m-%Y")
 
     def get_avatar(self, obj):
-        if obj.avatar:
-            if isinstance(obj.avatar, str):
-                return obj.avatar
-            else:
-                return obj.avatar.url if obj.avatar else None
-        return None
+        return variant_url(obj.avatar_variants, 'full', obj.avatar)
 
 
 class UserCourseSerializer(BaseSerializer):
@@ -267,11 +353,13 @@ class TopicSerializer(serializers.ModelSerializer, UserNameMixin):
 class CommentSerializer(serializers.ModelSerializer, UserNameMixin):
     user = serializers.SerializerMethodField(read_only=True)
     user_avatar = serializers.SerializerMethodField(read_only=True)
+    user_avatar_thumbnail = serializers.SerializerMethodField(read_only=True)
     replies = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'user', 'user_avatar', 'forum', 'topic', 'parent', 'content', 'replies', 'created_at']
+        fields = ['id', 'user', 'user_avatar', 'user_avatar_thumbnail', 'forum', 'topic', 'parent', 'content',
+                  'replies', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
 
     def __init__(self, *args, **kwargs):
@@ -286,12 +374,11 @@ class CommentSerializer(serializers.ModelSerializer, UserNameMixin):
         return self.get_username(obj)
 
     def get_user_avatar(self, obj):
-        if obj.user.avatar:
-            if isinstance(obj.user.avatar, str):
-                return obj.user.avatar
-            else:
-                return obj.user.avatar.url if obj.user.avatar else None
-        return None
+        return variant_url(obj.user.avatar_variants, 'full', obj.user.avatar)
+
+    def get_user_avatar_thumbnail(self, obj):
+        # Ảnh 160x160 cho danh sách bình luận
+        return variant_url(obj.user.avatar_variants, 'thumbnail', obj.user.avatar)
 
     def get_replies(self, obj):
         replies = obj.replies.all()
@@ -303,6 +390,7 @@ class CommentSerializer(serializers.ModelSerializer, UserNameMixin):
 
 
 class LecturerSerializer(serializers.ModelSerializer):
+    avatar = serializers.SerializerMethodField(read_only=True)
     userRole = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -314,12 +402,7 @@ class LecturerSerializer(serializers.ModelSerializer):
         return obj.userRole.name if obj.userRole else None
 
     def get_avatar(self, obj):
-        if obj.avatar:
-            if isinstance(obj.avatar, str):
-                return obj.avatar
-            else:
-                return obj.avatar.url if obj.avatar else None
-        return None
+        return variant_url(obj.avatar_variants, 'full', obj.avatar)
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -346,7 +429,8 @@ class ChapterDetailSerializer(serializers.ModelSerializer):
                   'lessons']
 
 
-class CourseDetailSerializer(serializers.ModelSerializer):
+class CourseDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sparse_sources = {'students_count': ('student_count',)}
     lecturer = LecturerSerializer(read_only=True)
     students_count = serializers.SerializerMethodField(read_only=True)
     chapters = ChapterDetailSerializer(many=True, read_only=True)
@@ -357,18 +441,26 @@ class CourseDetailSerializer(serializers.ModelSerializer):
                   'requirements', 'video_url', 'lecturer', 'students_count', 'chapters']
 
     def get_students_count(self, obj):
-        return obj.user_course.count()
+        return obj.student_count
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
         # Convert duration from minutes to seconds
-        data['duration'] = instance.duration * 60
+        if 'duration' in self.fields:
+            data['duration'] = instance.duration * 60
         # Convert price to string
-        data['price'] = str(instance.price) if instance.price else '0'
+        if 'price' in self.fields:
+            data['price'] = str(instance.price) if instance.price else '0'
         return data
 
 
-class LessonProgressSerializer(serializers.ModelSerializer):
+class CourseTreeSerializer(CourseDetailSerializer):
+    """CourseDetailSerializer over the chapter nodes built by course_tree.load_chapter_nodes"""
+    chapters = ChapterDetailSerializer(source='chapter_nodes', many=True, read_only=True)
+
+
+class LessonProgressSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sparse_sources = {'status_display': ('status',)}
     lesson_name = serializers.CharField(source='lesson.name', read_only=True)
     lesson_duration = serializers.IntegerField(source='lesson.duration', read_only=True)
     status_display = serializers.SerializerMethodField(read_only=True)
@@ -389,9 +481,10 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         return status_map.get(obj.status, obj.status)
 
 
-class CourseProgressSerializer(serializers.ModelSerializer):
+class CourseProgressSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sparse_sources = {'course_image': ('course__image', 'course__image_variants')}
     course_name = serializers.CharField(source='course.name', read_only=True)
-    course_image = serializers.CharField(source='course.image.url', read_only=True)
+    course_image = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = CourseProgress
@@ -399,6 +492,9 @@ class CourseProgressSerializer(serializers.ModelSerializer):
                   'total_watch_time', 'completion_percentage', 'last_accessed_at', 'enrolled_at']
         read_only_fields = ['id', 'total_lessons', 'completed_lessons', 'total_watch_time', 'completion_percentage']
 
+    def get_course_image(self, obj):
+        return variant_url(obj.course.image_variants, 'full', obj.course.image)
+
 
 class LessonProgressUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -423,18 +519,23 @@ class LessonProgressUpdateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
+        # CourseProgress được cập nhật theo delta bởi signal post_save của LessonProgress
         instance.save()
 
-        # Update course progress
-        course_progress, created = CourseProgress.objects.get_or_create(
-            user=instance.user,
-            course=instance.lesson.chapter.course
-        )
-        course_progress.update_progress()
-
         return instance
 
 
+class LessonProgressHeartbeatSerializer(serializers.Serializer):
+    lesson_id = serializers.IntegerField()
+    watch_time = serializers.IntegerField(min_value=0, default=0)
+    completion_percentage = serializers.FloatField(min_value=0, max_value=100, default=0)
+    client_ts = serializers.DateTimeField(required=False)
+
+
+class LessonProgressBatchSerializer(serializers.Serializer):
+    updates = LessonProgressHeartbeatSerializer(many=True, allow_empty=False, max_length=100)
+
+
 class EnrolledCourseSerializer(serializers.ModelSerializer):
     course = CourseDetailSerializer(read_only=True)
     progress = CourseProgressSerializer(read_only=True)
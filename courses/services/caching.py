@@ -0,0 +1,139 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = 'version:{}'
+MTIME_KEY = 'version-mtime:{}'
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _initial_version():
+    # Không bắt đầu lại từ 1 khi key version bị evict, tránh đọc nhầm dữ liệu cache cũ
+    return int(time.time() * 1000)
+
+
+def _timeout(name):
+    # Version theo từng đối tượng ("course_tree:12") hết hạn, version theo bảng giữ mãi
+    return settings.OBJECT_VERSION_TIMEOUT if ':' in name else None
+
+
+def get_versions(*names):
+    """Return the current version counter of each name (a table or an object), creating missing ones."""
+    keys = [VERSION_KEY.format(name) for name in names]
+    values = cache.get_many(keys)
+    for name, key in zip(names, keys):
+        if key not in values:
+            cache.add(key, _initial_version(), timeout=_timeout(name))
+            values[key] = cache.get(key)
+    return tuple(values[key] for key in keys)
+
+
+def object_versions(names, exists):
+    """
+    names when their version keys are already there or exists() confirms the object, else an empty tuple,
+    so requests for unknown pks never create version keys.
+    """
+    if len(cache.get_many([VERSION_KEY.format(name) for name in names])) == len(names) or exists():
+        return tuple(names)
+    return ()
+
+
+def bump_version(name):
+    """Move the version of name forward and return the new value."""
+    key = VERSION_KEY.format(name)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=_timeout(name))
+        version = cache.get(key)
+    cache.set(MTIME_KEY.format(name), time.time(), timeout=_timeout(name))
+    return version
+
+
+def last_modified(*names):
+    """Time of the latest bump among names; unknown ones count as modified now."""
+    keys = [MTIME_KEY.format(name) for name in names]
+    values = cache.get_many(keys)
+    now = time.time()
+    for name, key in zip(names, keys):
+        if key not in values:
+            cache.add(key, now, timeout=_timeout(name))
+            values[key] = cache.get(key, now)
+    return datetime.fromtimestamp(max(values.values()), tz=timezone.utc)
+
+
+def versions_etag(names, *parts):
+    """Strong ETag built from version counters only, without rendering the body."""
+    versions = '.'.join(str(version) for version in get_versions(*names))
+    digest = hashlib.md5('|'.join([versions, *(str(part) for part in parts)]).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def is_shared_cache():
+    """False when the default cache lives inside the process (LocMem, dummy), i.e. other processes never see its writes."""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def bump_version_on_commit(name):
+    # Tăng version sau khi commit để request khác không cache lại dữ liệu cũ với version mới
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def normalize_query(params, exclude=()):
+    """Canonical query string: sorted keys and values, empty values and excluded keys dropped."""
+    items = []
+    for key in params:
+        if key in exclude:
+            continue
+        values = params.getlist(key) if hasattr(params, 'getlist') else [params[key]]
+        items.extend((key, value) for value in values if value not in ('', None))
+    return urlencode(sorted(items))
+
+
+def versioned_key(prefix, names, *parts):
+    versions = '.'.join(str(version) for version in get_versions(*names))
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'{prefix}:{versions}:{digest}'
+
+
+def cached_json_response(key, build, timeout):
+    """Serve the pre-encoded JSON body stored under key, building and storing it on a miss."""
+    body = cache.get(key)
+    if body is None:
+        body = JSONRenderer().render(build())
+        cache.set(key, body, timeout)
+    return HttpResponse(body, content_type='application/json')
+
+
+def conditional_get(names, validator=None):
+    """
+    ETag / Last-Modified for a viewset method from version counters, so a 304 never runs the view.
+    names is a tuple of version names or a callable building it from the URL kwargs.
+    validator(kwargs) adds a value read from the DB to the ETag, for data written by other processes;
+    Last-Modified is then left out since the version counters alone cannot vouch for it.
+    """
+    def names_for(kwargs):
+        return names(kwargs) if callable(names) else names
+
+    def etag(request, *args, **kwargs):
+        parts = [request.get_host(), request.META.get('HTTP_ACCEPT', ''), normalize_query(request.GET)]
+        if validator is not None:
+            parts.append(validator(kwargs))
+        return versions_etag(names_for(kwargs), *parts)
+
+    def modified(request, *args, **kwargs):
+        return last_modified(*names_for(kwargs))
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=None if validator else modified))
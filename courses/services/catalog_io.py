@@ -0,0 +1,398 @@
+"""
+Streaming import / export of the Course -> Chapter -> Lesson -> Document hierarchy.
+
+JSONL: one course per line, chapters / lessons / documents nested inside it.
+CSV: one row per document (or per lesson / chapter / course without children), rows of a course
+are consecutive and share `ref`; a new chapter / lesson starts when its name changes.
+"""
+import csv
+import json
+import os
+import time
+from collections import defaultdict, deque
+from itertools import groupby, islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from courses.models import Category, Chapter, Course, Document, Lesson, User
+from courses.search import build_search_text
+from courses.services import course_totals, images, lesson_map, suggest, teacher_stats
+from courses.services.caching import bump_version_on_commit
+
+COURSE_FIELDS = ('name', 'subject', 'description', 'image', 'thumbnail_url', 'video_url', 'price', 'level',
+                 'duration', 'learning_outcomes', 'requirements', 'active')
+CHAPTER_FIELDS = ('name', 'description', 'is_published', 'active')
+LESSON_FIELDS = ('name', 'description', 'type', 'video_url', 'duration', 'is_published', 'active')
+DOCUMENT_FIELDS = ('name', 'file_url', 'type')
+
+# Cột CSV: tiền tố theo cấp, khóa ngoại của khóa học dùng tên / username
+CSV_COLUMNS = (
+    ['ref', 'category', 'lecturer'] + [f'course_{name}' for name in COURSE_FIELDS]
+    + [f'chapter_{name}' for name in CHAPTER_FIELDS]
+    + [f'lesson_{name}' for name in LESSON_FIELDS]
+    + [f'document_{name}' for name in DOCUMENT_FIELDS]
+)
+FORMATS = ('jsonl', 'csv')
+MAX_REPORTED_ERRORS = 100
+
+
+class CatalogRecordError(ValueError):
+    pass
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.records = 0
+        self.courses = 0
+        self.skipped = 0
+        self.failed = 0
+        self.rows = 0
+        self.errors = []
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def add_error(self, ref, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'ref': ref, 'detail': message})
+
+    def as_dict(self):
+        return {'records': self.records, 'courses': self.courses, 'skipped': self.skipped,
+                'failed': self.failed, 'rows': self.rows,
+                'rows_per_second': round(self.rows_per_second, 1), 'errors': self.errors}
+
+
+def format_for(path, default='jsonl'):
+    extension = os.path.splitext(path or '')[1].lstrip('.').lower()
+    return extension if extension in FORMATS else default
+
+
+# ---------- Export ----------
+
+def _raw_value(model, name, value):
+    # values() trả về CloudinaryResource cho cột ảnh: xuất lại chuỗi lưu trong DB
+    return model._meta.get_field(name).get_prep_value(value) if name == 'image' else value
+
+
+def _children(model, parent_field, parent_ids, fields):
+    by_parent = defaultdict(list)
+    rows = model.objects.filter(**{f'{parent_field}__in': parent_ids}).order_by('pk') \
+        .values('pk', parent_field, *fields)
+    for row in rows:
+        by_parent[row.pop(parent_field)].append(row)
+    return by_parent
+
+
+def iter_course_records(queryset=None, chunk_size=200):
+    """Yield nested course dicts, loading chunk_size courses and their content with 4 queries per chunk."""
+    queryset = (queryset if queryset is not None else Course.objects.all()).order_by('pk')
+    last_pk = 0
+    while True:
+        courses = list(queryset.filter(pk__gt=last_pk)
+                       .values('pk', 'import_ref', 'category__name', 'lecturer__username', *COURSE_FIELDS)
+                       [:chunk_size])
+        if not courses:
+            return
+        last_pk = courses[-1]['pk']
+        chapters = _children(Chapter, 'course_id', [course['pk'] for course in courses], CHAPTER_FIELDS)
+        chapter_ids = [chapter['pk'] for rows in chapters.values() for chapter in rows]
+        lessons = _children(Lesson, 'chapter_id', chapter_ids, LESSON_FIELDS)
+        lesson_ids = [lesson['pk'] for rows in lessons.values() for lesson in rows]
+        documents = _children(Document, 'lesson_id', lesson_ids, DOCUMENT_FIELDS)
+
+        for course in courses:
+            record = {'ref': course['import_ref'] or f"course-{course['pk']}",
+                      'category': course['category__name'], 'lecturer': course['lecturer__username']}
+            record.update((name, _raw_value(Course, name, course[name])) for name in COURSE_FIELDS)
+            record['chapters'] = []
+            for chapter in chapters[course['pk']]:
+                chapter_record = {name: chapter[name] for name in CHAPTER_FIELDS}
+                chapter_record['lessons'] = []
+                for lesson in lessons[chapter['pk']]:
+                    lesson_record = {name: lesson[name] for name in LESSON_FIELDS}
+                    lesson_record['documents'] = [{name: document[name] for name in DOCUMENT_FIELDS}
+                                                  for document in documents[lesson['pk']]]
+                    chapter_record['lessons'].append(lesson_record)
+                record['chapters'].append(chapter_record)
+            yield record
+
+
+def _csv_line(values):
+    buffer = _LineBuffer()
+    csv.writer(buffer).writerow(values)
+    return buffer.line
+
+
+class _LineBuffer:
+    line = ''
+
+    def write(self, line):
+        self.line = line
+
+
+def _flatten(record):
+    course = {'ref': record['ref'], 'category': record.get('category'), 'lecturer': record.get('lecturer')}
+    course.update((f'course_{name}', record.get(name)) for name in COURSE_FIELDS)
+    if not record.get('chapters'):
+        yield course
+    for chapter in record.get('chapters', []):
+        chapter_row = dict(course, **{f'chapter_{name}': chapter.get(name) for name in CHAPTER_FIELDS})
+        if not chapter.get('lessons'):
+            yield chapter_row
+        for lesson in chapter.get('lessons', []):
+            lesson_row = dict(chapter_row, **{f'lesson_{name}': lesson.get(name) for name in LESSON_FIELDS})
+            if not lesson.get('documents'):
+                yield lesson_row
+            for document in lesson.get('documents', []):
+                yield dict(lesson_row, **{f'document_{name}': document.get(name) for name in DOCUMENT_FIELDS})
+
+
+def export_lines(records, file_format='jsonl'):
+    """Encode course records as JSONL or CSV text lines, one at a time."""
+    if file_format == 'csv':
+        yield _csv_line(CSV_COLUMNS)
+        for record in records:
+            for row in _flatten(record):
+                yield _csv_line(['' if row.get(column) is None else row.get(column) for column in CSV_COLUMNS])
+    else:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+# ---------- Import ----------
+
+def _group_rows(rows, key):
+    # Các dòng liên tiếp cùng giá trị key thuộc cùng một đối tượng
+    return groupby(rows, key=lambda row: row.get(key) or '')
+
+
+def _prefixed(row, prefix, fields):
+    return {name: row.get(f'{prefix}_{name}') for name in fields}
+
+
+def read_csv_records(lines):
+    for ref, course_rows in _group_rows(csv.DictReader(lines), 'ref'):
+        course_rows = list(course_rows)
+        first = course_rows[0]
+        record = {'ref': ref, 'category': first.get('category'), 'lecturer': first.get('lecturer'),
+                  'chapters': []}
+        record.update(_prefixed(first, 'course', COURSE_FIELDS))
+        for chapter_name, chapter_rows in _group_rows(course_rows, 'chapter_name'):
+            chapter_rows = list(chapter_rows)
+            if not chapter_name:
+                continue
+            chapter = dict(_prefixed(chapter_rows[0], 'chapter', CHAPTER_FIELDS), lessons=[])
+            for lesson_name, lesson_rows in _group_rows(chapter_rows, 'lesson_name'):
+                lesson_rows = list(lesson_rows)
+                if not lesson_name:
+                    continue
+                lesson = dict(_prefixed(lesson_rows[0], 'lesson', LESSON_FIELDS), documents=[
+                    _prefixed(row, 'document', DOCUMENT_FIELDS) for row in lesson_rows if row.get('document_name')
+                ])
+                chapter['lessons'].append(lesson)
+            record['chapters'].append(chapter)
+        yield record
+
+
+def read_jsonl_records(lines):
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            # Dòng hỏng vẫn được tính là một bản ghi để checkpoint không bị lệch
+            yield {'ref': f'line-{number}', '_error': f'Invalid JSON: {e}'}
+            continue
+        if isinstance(record, dict):
+            yield record
+        else:
+            yield {'ref': f'line-{number}', '_error': f'Expected a JSON object, got {type(record).__name__}'}
+
+
+def read_records(lines, file_format='jsonl'):
+    return read_csv_records(lines) if file_format == 'csv' else read_jsonl_records(lines)
+
+
+def _build(model, data, fields, **extra):
+    values = {}
+    for name in fields:
+        value = data.get(name)
+        if value in ('', None):
+            # Bỏ trống: dùng giá trị mặc định của model
+            continue
+        try:
+            values[name] = model._meta.get_field(name).clean(value, None)
+        except ValidationError as e:
+            raise CatalogRecordError(f"{model.__name__}.{name}: {'; '.join(e.messages)}")
+    return model(**values, **extra)
+
+
+def _objects(data, key):
+    """The list of nested objects under key (chapters, lessons, documents) of a record."""
+    items = data.get(key) or []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise CatalogRecordError(f"{key} must be a list of objects")
+    return items
+
+
+def _assign_pks(model, objs, parent_field):
+    """Fill pks that bulk_create could not return (MySQL): new rows of a parent come back in insertion order."""
+    if all(obj.pk for obj in objs):
+        return
+    pks = defaultdict(deque)
+    parent_ids = {getattr(obj, parent_field) for obj in objs}
+    for pk, parent_id in model.objects.filter(**{f'{parent_field}__in': parent_ids}) \
+            .order_by('pk').values_list('pk', parent_field):
+        pks[parent_id].append(pk)
+    for obj in objs:
+        obj.pk = pks[getattr(obj, parent_field)].popleft()
+
+
+class CatalogImporter:
+    """Imports course records in batches of batch_size courses, one transaction per batch."""
+
+    def __init__(self, batch_size=100, stats=None):
+        self.batch_size = batch_size
+        self.stats = stats or ImportStats()
+
+    def run(self, records, skip=0, on_batch=None):
+        records = iter(records)
+        if skip:
+            # Tiếp tục từ checkpoint: bỏ qua các bản ghi đã commit
+            self.stats.records += sum(1 for _ in islice(records, skip))
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                return self.stats
+            self.import_batch(batch)
+            self.stats.records += len(batch)
+            if on_batch:
+                on_batch(self.stats)
+
+    def import_batch(self, batch):
+        refs = [record.get('ref') for record in batch]
+        existing = set(Course.objects.filter(import_ref__in=[ref for ref in refs if ref])
+                       .values_list('import_ref', flat=True))
+        categories = self._lookup(Category, 'name', batch, 'category')
+        lecturers = self._lookup(User, 'username', batch, 'lecturer')
+
+        courses, seen = [], set()
+        for record in batch:
+            ref = record.get('ref')
+            if ref in existing or ref in seen:
+                # Đã import (chạy lại sau khi bị ngắt) hoặc trùng trong file
+                self.stats.skipped += 1
+                continue
+            try:
+                courses.append(self._build_course(record, categories, lecturers))
+                seen.add(ref)
+            except CatalogRecordError as e:
+                self.stats.add_error(ref, str(e))
+        if not courses:
+            return
+
+        with transaction.atomic():
+            self._create(courses)
+            self.stats.courses += len(courses)
+            bump_version_on_commit('course')
+            # bulk_create không gọi signal của Chapter / Lesson
+            lesson_map.invalidate()
+            lecturer_ids = {course.lecturer_id for course, _ in courses}
+            teacher_stats.refresh_teacher_stats(lecturer_ids)
+            course_ids = [course.pk for course, _ in courses]
+            course_totals.refresh_course_totals(course_ids)
+            transaction.on_commit(lambda: suggest.refresh_items(course_ids, lecturer_ids))
+
+    def _lookup(self, model, field, batch, key):
+        names = {record.get(key) for record in batch} - {None, ''}
+        return dict(model.objects.filter(**{f'{field}__in': names}).values_list(field, 'pk')) if names else {}
+
+    def _build_course(self, record, categories, lecturers):
+        ref = record.get('ref')
+        if record.get('_error'):
+            raise CatalogRecordError(record['_error'])
+        if not ref:
+            raise CatalogRecordError("Missing ref")
+        category, lecturer = record.get('category'), record.get('lecturer')
+        if category and category not in categories:
+            raise CatalogRecordError(f"Unknown category: {category}")
+        if lecturer and lecturer not in lecturers:
+            raise CatalogRecordError(f"Unknown lecturer: {lecturer}")
+
+        course = _build(Course, record, COURSE_FIELDS, import_ref=ref,
+                        category_id=categories.get(category), lecturer_id=lecturers.get(lecturer))
+        if not course.name or not course.subject:
+            raise CatalogRecordError("Course name and subject are required")
+        # bulk_create không gọi signal pre_save
+        course.search_text = build_search_text(course)
+        course.image_variants = images.build_variants(course, 'image')
+
+        tree = []
+        for chapter_data in _objects(record, 'chapters'):
+            lessons = []
+            for lesson_data in _objects(chapter_data, 'lessons'):
+                lesson = _build(Lesson, lesson_data, LESSON_FIELDS)
+                if lesson.duration is None:
+                    lesson.duration = 0
+                documents = [_build(Document, data, DOCUMENT_FIELDS) for data in _objects(lesson_data, 'documents')]
+                if any(not document.file_url for document in documents):
+                    raise CatalogRecordError("Document.file_url is required")
+                lessons.append((lesson, documents))
+            tree.append((_build(Chapter, chapter_data, CHAPTER_FIELDS), lessons))
+        return course, tree
+
+    def _create(self, courses):
+        Course.objects.bulk_create([course for course, _ in courses], batch_size=self.batch_size)
+        _assign_pks(Course, [course for course, _ in courses], 'import_ref')
+
+        chapters = []
+        for course, tree in courses:
+            for chapter, _ in tree:
+                chapter.course_id = course.pk
+                chapters.append(chapter)
+        Chapter.objects.bulk_create(chapters, batch_size=self.batch_size)
+        _assign_pks(Chapter, chapters, 'course_id')
+
+        lessons = []
+        for _, tree in courses:
+            for chapter, chapter_lessons in tree:
+                for lesson, _ in chapter_lessons:
+                    lesson.chapter_id = chapter.pk
+                    lessons.append(lesson)
+        Lesson.objects.bulk_create(lessons, batch_size=self.batch_size)
+        _assign_pks(Lesson, lessons, 'chapter_id')
+
+        documents = []
+        for _, tree in courses:
+            for _, chapter_lessons in tree:
+                for lesson, lesson_documents in chapter_lessons:
+                    for document in lesson_documents:
+                        document.lesson_id = lesson.pk
+                        documents.append(document)
+        Document.objects.bulk_create(documents, batch_size=self.batch_size)
+        self.stats.rows += len(courses) + len(chapters) + len(lessons) + len(documents)
+
+
+# ---------- Checkpoint ----------
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(path, stats):
+    # Ghi file tạm rồi đổi tên để checkpoint không bị hỏng nếu tiến trình dừng giữa chừng
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'records': stats.records, 'courses': stats.courses, 'rows': stats.rows}, f)
+    os.replace(tmp_path, path)
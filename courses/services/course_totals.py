@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from courses.models import Course, CourseProgress, Lesson, published_lessons_q
+from courses.services import progress
+
+
+def lesson_totals(course_ids):
+    """{course_id: (published_lesson_count, total_duration)} with one grouped query."""
+    rows = Lesson.objects.filter(published_lessons_q(), chapter__course_id__in=course_ids) \
+        .values('chapter__course_id').annotate(count=Count('id'), duration=Sum('duration')).order_by()
+    return {row['chapter__course_id']: (row['count'], row['duration'] or 0) for row in rows}
+
+
+def refresh_course_totals(course_ids, recount_progress=False):
+    """
+    Recompute published_lesson_count / total_duration of the given courses. When the lesson count changes every
+    CourseProgress of the course is rescaled with one UPDATE; recount_progress=True (lessons with progress changed
+    publication or moved) also schedules a background recount of the completed lessons after commit.
+    """
+    course_ids = set(course_ids) - {None}
+    if not course_ids:
+        return
+    totals = lesson_totals(course_ids)
+    current = Course.objects.filter(pk__in=course_ids).values_list('pk', 'published_lesson_count', 'total_duration')
+    for course_id, lesson_count, total_duration in current:
+        new_count, new_duration = totals.get(course_id, (0, 0))
+        if (lesson_count, total_duration) != (new_count, new_duration):
+            # update() để không kích hoạt signal / cache của Course
+            Course.objects.filter(pk=course_id).update(published_lesson_count=new_count, total_duration=new_duration)
+        if lesson_count != new_count:
+            CourseProgress.apply_course_total(course_id, new_count)
+        if recount_progress:
+            progress.schedule_course_recount(course_id)
+
+
+def rebuild_course_totals(batch_size=500):
+    """Recompute the totals of every course with one grouped query. Returns the number of courses."""
+    totals = lesson_totals(Course.objects.values('pk'))
+    courses = [Course(pk=course_id, published_lesson_count=count, total_duration=duration)
+               for course_id, (count, duration) in totals.items()]
+    with transaction.atomic():
+        Course.objects.update(published_lesson_count=0, total_duration=0)
+        Course.objects.bulk_update(courses, ['published_lesson_count', 'total_duration'], batch_size=batch_size)
+    return len(courses)
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from courses.models import Chapter, Lesson
+from courses.services import caching
+
+
+def tree_version_name(course_id):
+    return f'course_tree:{course_id}'
+
+
+def bump_course_trees(course_ids):
+    for course_id in set(course_ids):
+        if course_id:
+            caching.bump_version_on_commit(tree_version_name(course_id))
+
+
+def course_ids_for(model, parent_ids):
+    """Course ids owning the given parents of a Chapter / Lesson / Document."""
+    parent_ids = [parent_id for parent_id in parent_ids if parent_id]
+    if model is Chapter:
+        return parent_ids
+    if model is Lesson:
+        return Chapter.objects.filter(pk__in=parent_ids).values_list('course_id', flat=True)
+    return Lesson.objects.filter(pk__in=parent_ids).values_list('chapter__course_id', flat=True)
+
+
+class TreeNode:
+    """Lightweight stand-in for a model instance, readable by the detail serializers."""
+    __slots__ = ()
+    columns = ()
+
+    def __init__(self, values):
+        for name, value in zip(self.columns, values):
+            setattr(self, name, value)
+
+    def serializable_value(self, field_name):
+        # PrimaryKeyRelatedField đọc khóa ngoại qua hàm này (giống Model.serializable_value)
+        return getattr(self, f'{field_name}_id')
+
+
+class DocumentNode(TreeNode):
+    columns = ('id', 'lesson_id', 'name', 'file_url', 'type', 'active', 'created_at', 'updated_at')
+    __slots__ = columns
+
+
+class LessonNode(TreeNode):
+    columns = ('id', 'chapter_id', 'name', 'description', 'type', 'video_url', 'duration', 'is_published', 'active',
+               'created_at', 'updated_at')
+    __slots__ = columns + ('documents',)
+
+
+class ChapterNode(TreeNode):
+    columns = ('id', 'course_id', 'name', 'description', 'is_published', 'active', 'created_at', 'updated_at')
+    __slots__ = columns + ('lessons',)
+
+
+def _tree_columns():
+    lesson_columns = [column for column in LessonNode.columns if column != 'chapter_id']
+    document_columns = [column for column in DocumentNode.columns if column != 'lesson_id']
+    return (
+        list(ChapterNode.columns)
+        + [f'lessons__{column}' for column in lesson_columns]
+        + [f'lessons__documents__{column}' for column in document_columns]
+    ), len(ChapterNode.columns), len(lesson_columns)
+
+
+def load_chapter_nodes(course_id):
+    """Chapters -> lessons -> documents of a course from a single LEFT JOIN query."""
+    columns, chapter_width, lesson_width = _tree_columns()
+    rows = Chapter.objects.filter(course_id=course_id) \
+        .order_by('id', 'lessons__id', 'lessons__documents__id').values_list(*columns)
+
+    chapters, lessons = {}, {}
+    for row in rows:
+        chapter = chapters.get(row[0])
+        if chapter is None:
+            chapter = chapters[row[0]] = ChapterNode(row[:chapter_width])
+            chapter.lessons = []
+
+        lesson_row = row[chapter_width:chapter_width + lesson_width]
+        if lesson_row[0] is None:
+            continue
+        lesson = lessons.get(lesson_row[0])
+        if lesson is None:
+            lesson = lessons[lesson_row[0]] = LessonNode((lesson_row[0], chapter.id) + lesson_row[1:])
+            lesson.documents = []
+            chapter.lessons.append(lesson)
+
+        document_row = row[chapter_width + lesson_width:]
+        if document_row[0] is not None:
+            lesson.documents.append(DocumentNode((document_row[0], lesson.id) + document_row[1:]))
+
+    return list(chapters.values())
+
+
+def get_course_tree(course, load_course=None):
+    """
+    CourseDetailSerializer output of a course. The content tree is cached per course version;
+    students_count changes with every enrollment so it is read from the course row instead.
+    course only needs pk and student_count when load_course() returns the full row for a rebuild.
+    """
+    from courses.serializers import CourseTreeSerializer
+
+    key = caching.versioned_key('course-tree', [tree_version_name(course.pk)], course.pk)
+    data = cache.get(key)
+    if data is None:
+        full = load_course() if load_course is not None else course
+        full.chapter_nodes = load_chapter_nodes(course.pk)
+        data = dict(CourseTreeSerializer(full).data)
+        data.pop('students_count', None)
+        cache.set(key, data, settings.COURSE_TREE_CACHE_TIMEOUT)
+
+    data['students_count'] = course.student_count
+    return data
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from courses.models import Course, CourseStatus, UserCourse
+from courses.services.teacher_stats import apply_student_delta
+
+# Trạng thái -> cột đếm tương ứng trên Course
+STATUS_COUNTER_FIELDS = {
+    CourseStatus.PENDING: 'pending_student_count',
+    CourseStatus.IN_PROGRESS: 'in_progress_student_count',
+    CourseStatus.COMPLETE: 'complete_student_count',
+}
+COUNTER_FIELDS = ('student_count', *STATUS_COUNTER_FIELDS.values())
+# Đăng ký đã thanh toán
+PAID_STATUSES = (CourseStatus.IN_PROGRESS, CourseStatus.COMPLETE)
+
+
+def students_version_name(course_id):
+    return f'course_students:{course_id}'
+
+
+def _memberships_key(user_id):
+    return f'enrollments:{user_id}'
+
+
+def get_memberships(user_id):
+    """{course_id: frozenset of statuses} of every enrollment of the user, cached until a UserCourse changes."""
+    key = _memberships_key(user_id)
+    memberships = cache.get(key)
+    if memberships is None:
+        statuses = defaultdict(set)
+        for course_id, status in UserCourse.objects.filter(user_id=user_id).values_list('course_id', 'status'):
+            statuses[course_id].add(status)
+        memberships = {course_id: frozenset(values) for course_id, values in statuses.items()}
+        cache.set(key, memberships, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return memberships
+
+
+def is_enrolled(user_id, course_id, statuses=PAID_STATUSES):
+    return not get_memberships(user_id).get(course_id, frozenset()).isdisjoint(statuses)
+
+
+def enrolled_course_ids(user_id, statuses=PAID_STATUSES):
+    return {course_id for course_id, values in get_memberships(user_id).items() if not values.isdisjoint(statuses)}
+
+
+def invalidate_memberships(user_ids):
+    cache.delete_many([_memberships_key(user_id) for user_id in user_ids])
+
+
+def _add_deltas(changes, course_id, status, delta):
+    if not course_id:
+        return
+    changes[course_id]['student_count'] += delta
+    field = STATUS_COUNTER_FIELDS.get(status)
+    if field:
+        changes[course_id][field] += delta
+
+
+def apply_enrollment_change(old_course_id, old_status, new_course_id, new_status):
+    """Apply the counter deltas of one UserCourse transition with atomic F() updates."""
+    changes = defaultdict(lambda: defaultdict(int))
+    _add_deltas(changes, old_course_id, old_status, -1)
+    _add_deltas(changes, new_course_id, new_status, 1)
+
+    for course_id, deltas in changes.items():
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            Course.objects.filter(pk=course_id).update(**updates)
+        if deltas['student_count']:
+            apply_student_delta(course_id, deltas['student_count'])
+
+
+def recount_students(batch_size=500):
+    """Recompute every course counter from UserCourse in bulk. Returns the number of courses with enrollments."""
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    rows = UserCourse.objects.values('course_id', 'status').annotate(total=Count('id')).order_by()
+    for row in rows:
+        course_counts = counts[row['course_id']]
+        course_counts['student_count'] += row['total']
+        field = STATUS_COUNTER_FIELDS.get(row['status'])
+        if field:
+            course_counts[field] += row['total']
+
+    with transaction.atomic():
+        Course.objects.update(**dict.fromkeys(COUNTER_FIELDS, 0))
+        courses = [Course(pk=course_id, **course_counts) for course_id, course_counts in counts.items()]
+        Course.objects.bulk_update(courses, COUNTER_FIELDS, batch_size=batch_size)
+
+    return len(courses)
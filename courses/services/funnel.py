@@ -0,0 +1,66 @@
+"""
+Lesson completion funnel of a course for its teacher: per published lesson, how many learners started it,
+finished it and how long they watched. One grouped aggregate over Lesson LEFT JOIN LessonProgress.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from courses.models import Course, Lesson, LessonProgressStatus, published_lessons_q
+
+FUNNEL_KEY = 'course-funnel:{}'
+
+
+def funnel_key(course_id):
+    return FUNNEL_KEY.format(course_id)
+
+
+def compute_funnel(course_id):
+    learners = Course.objects.filter(pk=course_id) \
+        .values_list(F('in_progress_student_count') + F('complete_student_count'), flat=True).first() or 0
+    rows = Lesson.objects.filter(published_lessons_q(), chapter__course_id=course_id) \
+        .values('id', 'name', 'chapter_id', 'chapter__name', 'duration') \
+        .annotate(
+            started=Count('progress', filter=~Q(progress__status=LessonProgressStatus.NOT_STARTED)),
+            completed=Count('progress', filter=Q(progress__status=LessonProgressStatus.COMPLETED)),
+            average_watch_time=Avg('progress__watch_time',
+                                   filter=~Q(progress__status=LessonProgressStatus.NOT_STARTED)),
+        ).order_by('chapter_id', 'id')
+    lessons = []
+    for row in rows:
+        lessons.append({
+            'lesson_id': row['id'],
+            'lesson_name': row['name'],
+            'chapter_id': row['chapter_id'],
+            'chapter_name': row['chapter__name'],
+            'duration': row['duration'],
+            'started': row['started'],
+            'completed': row['completed'],
+            'average_watch_time': round(row['average_watch_time'] or 0, 1),
+            # Tỉ lệ trên số học viên đã thanh toán của khóa học
+            'started_rate': round(row['started'] / learners * 100, 2) if learners else 0,
+            'completed_rate': round(row['completed'] / learners * 100, 2) if learners else 0,
+        })
+    return {'course_id': course_id, 'learners': learners, 'generated_at': timezone.now(), 'lessons': lessons}
+
+
+def store_funnel(course_id, timeout):
+    """Compute the funnel and store its encoded JSON body (read by caching.cached_json_response)."""
+    body = JSONRenderer().render(compute_funnel(course_id))
+    cache.set(funnel_key(course_id), body, timeout)
+    return body
+
+
+def precompute_funnels(min_learners=None):
+    """Store the funnel of every large course for a day. Returns the number of courses."""
+    min_learners = settings.FUNNEL_PRECOMPUTE_MIN_LEARNERS if min_learners is None else min_learners
+    course_ids = Course.objects.filter(active=True) \
+        .annotate(learners=F('in_progress_student_count') + F('complete_student_count')) \
+        .filter(learners__gte=min_learners).values_list('pk', flat=True)
+    count = 0
+    for course_id in course_ids.iterator():
+        store_funnel(course_id, settings.FUNNEL_PRECOMPUTED_TIMEOUT)
+        count += 1
+    return count
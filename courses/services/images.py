@@ -0,0 +1,41 @@
+from cloudinary import CloudinaryResource
+from cloudinary.utils import generate_transformation_string
+from django.core.files.uploadedfile import UploadedFile
+
+# Biến thể ảnh được tính sẵn khi lưu; 'full' trùng với image.url trước đây
+IMAGE_VARIANTS = {
+    'thumbnail': {'width': 160, 'height': 160, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'card': {'width': 480, 'height': 270, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'full': {},
+}
+UPLOAD_SEGMENT = '/upload/'
+
+
+def _variant_url(resource, options):
+    if not resource.public_id.startswith(('http://', 'https://')):
+        return resource.build_url(**options)
+    # Ảnh upload qua BaseSerializer lưu cả secure_url: chèn transformation sau /upload/
+    url = resource.url
+    transformation = generate_transformation_string(**options)[0]
+    if transformation and UPLOAD_SEGMENT in url:
+        return url.replace(UPLOAD_SEGMENT, f'{UPLOAD_SEGMENT}{transformation}/', 1)
+    return url
+
+
+def build_variants(instance, field_name):
+    """Variant name -> URL for a CloudinaryField of instance, None when empty or not uploaded yet."""
+    value = getattr(instance, field_name)
+    if not value or isinstance(value, UploadedFile):
+        return None
+    resource = value if isinstance(value, CloudinaryResource) else \
+        instance._meta.get_field(field_name).to_python(value)
+    return {name: _variant_url(resource, options) for name, options in IMAGE_VARIANTS.items()}
+
+
+def variant_url(variants, name, value):
+    """Stored variant, falling back to the plain Cloudinary URL for rows not backfilled yet."""
+    if variants and name in variants:
+        return variants[name]
+    if not value:
+        return None
+    return value if isinstance(value, str) else value.url
@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.utils import timezone
+
+from courses.models import Course, UserCourse
+from courses.services.enrollment import PAID_STATUSES
+
+WINDOWS = {'7d': timedelta(days=7), '30d': timedelta(days=30), 'all': None}
+LEADERBOARD_KEY = 'leaderboard:{}'
+# Khóa ghi (giữ trong lúc đọc-sửa-ghi bảng) và khóa dựng lại của từng bảng
+LEADERBOARD_LOCK_KEY = 'leaderboard:{}:lock'
+LEADERBOARD_REBUILD_KEY = 'leaderboard:{}:rebuild'
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 2
+REBUILD_LOCK_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+def compute_ranking(window):
+    """Top LEADERBOARD_SIZE [course_id, paid_students] pairs of a window, best first."""
+    size = settings.LEADERBOARD_SIZE
+    if WINDOWS[window] is None:
+        # Toàn thời gian: dùng bộ đếm trên Course thay vì GROUP BY UserCourse
+        rows = Course.objects.filter(active=True) \
+            .annotate(total=F('in_progress_student_count') + F('complete_student_count')) \
+            .filter(total__gt=0).order_by('-total', 'pk').values_list('pk', 'total')[:size]
+    else:
+        rows = UserCourse.objects.filter(status__in=PAID_STATUSES, course__active=True,
+                                         created_at__gte=timezone.now() - WINDOWS[window]) \
+            .values('course_id').annotate(total=Count('id')).order_by('-total', 'course_id') \
+            .values_list('course_id', 'total')[:size]
+    return [list(row) for row in rows]
+
+
+@contextmanager
+def _board_lock(window):
+    """Hold the write lock of one board, waiting up to LOCK_WAIT seconds; yields whether it was acquired."""
+    key = LEADERBOARD_LOCK_KEY.format(window)
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(key, 1, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.05)
+    try:
+        yield True
+    finally:
+        cache.delete(key)
+
+
+def _store(window, built_at, ranking, age=0):
+    # Bảng hết hạn làm mới sau LEADERBOARD_TIMEOUT nhưng vẫn được phục vụ thêm LEADERBOARD_STALE_TIMEOUT
+    timeout = settings.LEADERBOARD_TIMEOUT + settings.LEADERBOARD_STALE_TIMEOUT - age
+    if timeout > 0:
+        cache.set(LEADERBOARD_KEY.format(window), (built_at, ranking), timeout)
+
+
+def rebuild(windows=tuple(WINDOWS)):
+    rankings = {}
+    for window in windows:
+        rankings[window] = compute_ranking(window)
+        with _board_lock(window):
+            # Ghi đè cả khi không lấy được khóa: bảng vừa tính mới hơn mọi chỉnh sửa đang dở
+            _store(window, time.time(), rankings[window])
+    return rankings
+
+
+def get_ranking(window):
+    """
+    The cached board of a window. A board older than LEADERBOARD_TIMEOUT is rebuilt by the one request that
+    takes the rebuild lock while concurrent requests keep serving it.
+    """
+    cached = cache.get(LEADERBOARD_KEY.format(window))
+    if cached is not None and time.time() - cached[0] < settings.LEADERBOARD_TIMEOUT:
+        return cached[1]
+
+    rebuild_key = LEADERBOARD_REBUILD_KEY.format(window)
+    if cache.add(rebuild_key, 1, timeout=REBUILD_LOCK_TIMEOUT):
+        try:
+            return rebuild([window])[window]
+        finally:
+            cache.delete(rebuild_key)
+    if cached is not None:
+        return cached[1]
+
+    # Chưa có bảng nào: chờ request đang dựng lại thay vì cùng chạy truy vấn xếp hạng
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        cached = cache.get(LEADERBOARD_KEY.format(window))
+        if cached is not None:
+            return cached[1]
+    return compute_ranking(window)
+
+
+def top_courses(window, limit):
+    ranking = get_ranking(window)[:limit]
+    courses = Course.objects.select_related('lecturer', 'category').in_bulk([course_id for course_id, _ in ranking])
+    return [courses[course_id] for course_id, _ in ranking if course_id in courses]
+
+
+def record_enrollment_change(old_course_id, old_status, new_course_id, new_status, enrolled_at):
+    """
+    Adjust the cached rankings in place for courses already on a board, under the board's write lock.
+    Courses entering a board show up at the next rebuild (TTL or the rebuild_leaderboard command).
+    """
+    deltas = defaultdict(int)
+    if old_course_id and old_status in PAID_STATUSES:
+        deltas[old_course_id] -= 1
+    if new_course_id and new_status in PAID_STATUSES:
+        deltas[new_course_id] += 1
+    deltas = {course_id: delta for course_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    for window, period in WINDOWS.items():
+        if period is not None and (enrolled_at is None or enrolled_at < timezone.now() - period):
+            continue
+        with _board_lock(window) as locked:
+            if not locked:
+                # Bảng sẽ đúng trở lại ở lần dựng lại tiếp theo
+                logger.warning("Leaderboard %s is locked, enrollment change not applied", window)
+                continue
+            cached = cache.get(LEADERBOARD_KEY.format(window))
+            if cached is None:
+                continue
+            built_at, ranking = cached
+            changed = False
+            for entry in ranking:
+                if entry[0] in deltas:
+                    entry[1] += deltas[entry[0]]
+                    changed = True
+            if changed:
+                ranking.sort(key=lambda entry: (-entry[1], entry[0]))
+                # Giữ nguyên built_at để bảng vẫn được dựng lại định kỳ
+                _store(window, built_at, ranking, age=time.time() - built_at)
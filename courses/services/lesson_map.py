@@ -0,0 +1,97 @@
+"""
+Compact lesson id -> (chapter_id, course_id, duration, is_published) map for the progress hot path.
+is_published tells whether the lesson counts in the course totals (see models.published_lessons_q).
+
+Built from one query into sorted numpy columns (a few bytes per lesson), shared through the cache and kept
+per process until the 'lesson_map' version changes, i.e. until a Lesson or Chapter is saved or deleted.
+"""
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, ExpressionWrapper
+
+from courses.models import Lesson, published_lessons_q
+from courses.services.caching import bump_version_on_commit, get_versions
+
+LESSON_MAP_VERSION = 'lesson_map'
+LESSON_MAP_KEY = 'lesson-map'
+
+LessonInfo = namedtuple('LessonInfo', 'chapter_id course_id duration is_published')
+
+_local = {'version': None, 'map': None}
+
+
+class LessonMap:
+    def __init__(self, lesson_ids, chapter_ids, course_ids, durations, published):
+        self.lesson_ids = lesson_ids
+        self.chapter_ids = chapter_ids
+        # 0 khi chương chưa gắn với khóa học
+        self.course_ids = course_ids
+        self.durations = durations
+        self.published = published
+
+    def _position(self, lesson_id):
+        try:
+            lesson_id = int(lesson_id)
+        except (TypeError, ValueError):
+            return None
+        position = int(np.searchsorted(self.lesson_ids, lesson_id))
+        if position < self.lesson_ids.size and self.lesson_ids[position] == lesson_id:
+            return position
+        return None
+
+    def get(self, lesson_id):
+        position = self._position(lesson_id)
+        if position is None:
+            return None
+        return LessonInfo(int(self.chapter_ids[position]), int(self.course_ids[position]) or None,
+                          int(self.durations[position]), bool(self.published[position]))
+
+    def get_many(self, lesson_ids):
+        """{lesson_id: LessonInfo} of the given lessons that exist."""
+        infos = {}
+        for lesson_id in lesson_ids:
+            info = self.get(lesson_id)
+            if info is not None:
+                infos[lesson_id] = info
+        return infos
+
+
+def build_lesson_map():
+    rows = Lesson.objects.order_by('pk').annotate(counted=ExpressionWrapper(published_lessons_q(),
+                                                                            output_field=BooleanField())) \
+        .values_list('pk', 'chapter_id', 'chapter__course_id', 'duration', 'counted')
+    flat = np.fromiter(chain.from_iterable((pk, chapter_id, course_id or 0, duration, counted)
+                                           for pk, chapter_id, course_id, duration, counted
+                                           in rows.iterator(chunk_size=10000)), dtype=np.int64)
+    columns = flat.reshape(-1, 5)
+    return LessonMap(columns[:, 0].copy(), columns[:, 1].copy(), columns[:, 2].copy(),
+                     columns[:, 3].astype(np.int32), columns[:, 4].astype(np.bool_))
+
+
+def get_lesson_map():
+    version = get_versions(LESSON_MAP_VERSION)[0]
+    if _local['version'] != version:
+        lesson_map = cache.get(LESSON_MAP_KEY)
+        # Snapshot trong cache có thể thuộc version cũ: lưu kèm version
+        if lesson_map is None or lesson_map[0] != version:
+            lesson_map = (version, build_lesson_map())
+            cache.set(LESSON_MAP_KEY, lesson_map, settings.LESSON_MAP_CACHE_TIMEOUT)
+        _local.update(version=version, map=lesson_map[1])
+    return _local['map']
+
+
+def lesson_info(lesson_id):
+    """LessonInfo of the lesson, None when it does not exist."""
+    return get_lesson_map().get(lesson_id)
+
+
+def lesson_infos(lesson_ids):
+    return get_lesson_map().get_many(lesson_ids)
+
+
+def invalidate():
+    bump_version_on_commit(LESSON_MAP_VERSION)
@@ -4,6 +4,7 @@ import uuid
 import requests
 import hmac
 import hashlib
+from django.db import transaction
 
 from courses.models import UserCourse, CourseStatus, Course, Payment
 
@@ -81,6 +82,8 @@ def create_momo_payment(user, amount, extraData, course_id):
 
 
 def update_status_user_course(id, status):
-    user_course = UserCourse.objects.get(id=id)
-    user_course.status = status
-    user_course.save()
+    # Khóa dòng để IPN gửi lại không làm lệch bộ đếm học viên
+    with transaction.atomic():
+        user_course = UserCourse.objects.select_for_update().get(id=id)
+        user_course.status = status
+        user_course.save()
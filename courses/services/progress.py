@@ -0,0 +1,288 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from courses.models import Course, CourseProgress, CourseStatus, LessonProgress, LessonProgressStatus, \
+    published_lessons_q
+from courses.services.enrollment import enrolled_course_ids
+from courses.services.lesson_map import lesson_info, lesson_infos
+
+# Trạng thái của LessonProgress nạp với only() thiếu cột cần thiết: không tính được delta
+UNKNOWN_STATE = 'unknown'
+# Cột được ghi bởi một heartbeat
+HEARTBEAT_FIELDS = ['status', 'watch_time', 'completion_percentage', 'last_watched_at', 'started_at',
+                    'completed_at', 'updated_at']
+RECOUNT_LOCK_KEY = 'course-progress-recount:{}:{}'
+COURSE_RECOUNT_LOCK_KEY = 'course-progress-recount:{}'
+
+logger = logging.getLogger(__name__)
+_executor = {'pool': None}
+
+
+def status_for_percentage(completion_percentage):
+    if completion_percentage >= 90:
+        return LessonProgressStatus.COMPLETED
+    if completion_percentage > 0:
+        return LessonProgressStatus.IN_PROGRESS
+    return LessonProgressStatus.NOT_STARTED
+
+
+def _recount(user_id, course_id):
+    with transaction.atomic():
+        CourseProgress.objects.get_or_create(user_id=user_id, course_id=course_id)
+        # Khóa dòng trước khi đếm: delta ghi đồng thời phải chờ rồi được cộng sau, không bị ghi đè
+        CourseProgress.objects.select_for_update().get(user_id=user_id, course_id=course_id).update_progress()
+
+
+def is_stale(course_progress, lesson_progresses):
+    """True when a LessonProgress changed after the stored CourseProgress (or the latter does not exist yet)."""
+    latest = max((lesson_progress.updated_at for lesson_progress in lesson_progresses
+                  if lesson_progress.updated_at), default=None)
+    if latest is None:
+        return False
+    return course_progress.pk is None or course_progress.updated_at is None or course_progress.updated_at < latest
+
+
+def schedule_recount(user_id, course_id):
+    """Recount one CourseProgress off the request path; concurrent requests for the same pair schedule it once."""
+    key = RECOUNT_LOCK_KEY.format(user_id, course_id)
+    if not cache.add(key, 1, timeout=60):
+        return False
+    # Chạy sau commit để luồng nền thấy dữ liệu của request hiện tại
+    transaction.on_commit(lambda: _pool().submit(_recount_in_background, user_id, course_id, key))
+    return True
+
+
+def _pool():
+    if _executor['pool'] is None:
+        _executor['pool'] = ThreadPoolExecutor(max_workers=settings.PROGRESS_RECOUNT_WORKERS,
+                                               thread_name_prefix='progress-recount')
+    return _executor['pool']
+
+
+def _recount_in_background(user_id, course_id, key):
+    try:
+        _recount(user_id, course_id)
+    except Exception:
+        logger.exception("Recount of course progress (user %s, course %s) failed", user_id, course_id)
+    finally:
+        cache.delete(key)
+        # Kết nối DB của luồng nền không được Django đóng theo request
+        connections.close_all()
+
+
+def schedule_course_recount(course_id):
+    """Recount every CourseProgress of a course in a background thread once the current transaction commits."""
+    transaction.on_commit(lambda: _submit_course_recount(course_id))
+
+
+def _submit_course_recount(course_id):
+    key = COURSE_RECOUNT_LOCK_KEY.format(course_id)
+    # Đã có lần đếm lại đang chờ: lần đó chưa bắt đầu nên sẽ thấy cả thay đổi này
+    if cache.add(key, 1, timeout=600):
+        _pool().submit(_recount_course_in_background, course_id, key)
+
+
+def _recount_course_in_background(course_id, key):
+    # Bỏ khóa trước khi đếm: thay đổi commit trong lúc đếm sẽ xếp lịch một lần đếm mới
+    cache.delete(key)
+    try:
+        recount_course_progress([course_id])
+    except Exception:
+        logger.exception("Recount of course progress (course %s) failed", course_id)
+    finally:
+        connections.close_all()
+
+
+def _add_delta(deltas, lesson, state, sign):
+    # lesson: LessonInfo của bài học, None khi bài học không còn tồn tại
+    if lesson is None or lesson.course_id is None:
+        return
+    _, status, watch_time = state
+    delta = deltas[lesson.course_id]
+    delta[0] += sign
+    # Bài học chưa xuất bản không được tính vào số bài đã hoàn thành
+    delta[1] += sign * (status == LessonProgressStatus.COMPLETED and lesson.is_published)
+    delta[2] += sign * (watch_time or 0)
+
+
+def _apply_deltas(user_id, deltas):
+    for course_id, (lessons, completed, watch_time) in deltas.items():
+        # Cả khi delta bằng 0 vẫn UPDATE để đóng dấu updated_at: LessonProgress vừa được ghi,
+        # nếu không is_stale sẽ coi CourseProgress là cũ và lên lịch đếm lại ở mỗi lần đọc
+        if not CourseProgress.apply_lesson_delta(user_id, course_id, completed, watch_time) and lessons >= 0:
+            # Chưa có CourseProgress: tạo mới và đếm lại toàn bộ (không tạo khi đang xóa)
+            _recount(user_id, course_id)
+
+
+def apply_lesson_progress_change(user_id, old_state, new_state):
+    """
+    Keep CourseProgress in step with one LessonProgress transition.
+    States are (lesson_id, status, watch_time) tuples, None when the row does not exist.
+    """
+    if old_state == UNKNOWN_STATE:
+        lesson = lesson_info(new_state[0]) if new_state else None
+        if lesson and lesson.course_id:
+            _recount(user_id, lesson.course_id)
+        return
+
+    deltas = defaultdict(lambda: [0, 0, 0])
+    lessons = lesson_infos({state[0] for state in (old_state, new_state) if state})
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is not None:
+            _add_delta(deltas, lessons.get(state[0]), state, sign)
+    _apply_deltas(user_id, deltas)
+
+
+def _latest_heartbeats(heartbeats):
+    # Mỗi bài học giữ heartbeat mới nhất: theo client_ts nếu có, không thì theo thứ tự gửi
+    latest = {}
+    for heartbeat in heartbeats:
+        current = latest.get(heartbeat['lesson_id'])
+        if current and current.get('client_ts') and heartbeat.get('client_ts') \
+                and heartbeat['client_ts'] < current['client_ts']:
+            continue
+        latest[heartbeat['lesson_id']] = heartbeat
+    return latest
+
+
+def validate_heartbeats(user_id, heartbeats):
+    """
+    Keep the latest heartbeat per lesson and drop those of unknown lessons or courses the user is not enrolled in,
+    resolved from the lesson map and the membership cache without queries.
+    Returns ({lesson_id: heartbeat}, {lesson_id: LessonInfo}, rejected).
+    """
+    latest = _latest_heartbeats(heartbeats)
+    lessons = lesson_infos(latest)
+    enrolled = enrolled_course_ids(user_id, [CourseStatus.IN_PROGRESS])
+    rejected = []
+    for lesson_id in list(latest):
+        if lesson_id not in lessons:
+            rejected.append({'lesson_id': lesson_id, 'detail': 'Lesson not found'})
+        elif lessons[lesson_id].course_id not in enrolled:
+            rejected.append({'lesson_id': lesson_id, 'detail': 'You are not enrolled in this course'})
+        else:
+            continue
+        del latest[lesson_id]
+    return latest, lessons, rejected
+
+
+def apply_heartbeats(user_id, heartbeats):
+    """
+    Apply a batch of {lesson_id, watch_time, completion_percentage, client_ts} updates of one user:
+    one query for existing rows, bulk writes, one UPDATE per course.
+    Returns (processed lesson ids, rejected [{lesson_id, detail}], affected course ids).
+    """
+    latest, lessons, rejected = validate_heartbeats(user_id, heartbeats)
+    write_heartbeats(user_id, latest, lessons)
+    return list(latest), rejected, {lessons[lesson_id].course_id for lesson_id in latest}
+
+
+def write_heartbeats(user_id, latest, lessons):
+    """Write already validated heartbeats ({lesson_id: heartbeat}) and the CourseProgress deltas they cause."""
+    if not latest:
+        return
+    try:
+        _write_heartbeats(user_id, latest, lessons)
+    except IntegrityError:
+        # Request khác (hoặc lần gửi lại) vừa tạo cùng dòng: đọc lại dưới khóa, lần này là cập nhật
+        _write_heartbeats(user_id, latest, lessons)
+
+
+def _write_heartbeats(user_id, latest, lessons):
+    now = timezone.now()
+    deltas = defaultdict(lambda: [0, 0, 0])
+    with transaction.atomic():
+        existing = {progress.lesson_id: progress for progress in
+                    LessonProgress.objects.select_for_update().filter(user_id=user_id, lesson_id__in=latest)}
+        created, updated = [], []
+        for lesson_id, heartbeat in latest.items():
+            progress = existing.get(lesson_id)
+            if progress is None:
+                progress = LessonProgress(user_id=user_id, lesson_id=lesson_id)
+                created.append(progress)
+            elif _superseded(progress, heartbeat):
+                continue
+            else:
+                _add_delta(deltas, lessons[lesson_id], (lesson_id, progress.status, progress.watch_time), -1)
+                updated.append(progress)
+            _apply_heartbeat(progress, heartbeat, now)
+            _add_delta(deltas, lessons[lesson_id], (lesson_id, progress.status, progress.watch_time), 1)
+
+        LessonProgress.objects.bulk_create(created)
+        LessonProgress.objects.bulk_update(updated, HEARTBEAT_FIELDS)
+        # bulk_create / bulk_update không gọi signal: cộng delta theo từng khóa học một lần
+        _apply_deltas(user_id, deltas)
+
+
+def _superseded(progress, heartbeat):
+    # Heartbeat lấy từ bộ đệm ghi sau được nhận trước lần ghi gần nhất của dòng (ghi trực tiếp, flush trước đó).
+    # So với last_watched_at: thời điểm của dữ liệu đang lưu, updated_at chỉ là lúc flush
+    received_at = heartbeat.get('received_at')
+    return received_at is not None and progress.last_watched_at is not None \
+        and received_at < progress.last_watched_at
+
+
+def _apply_heartbeat(progress, heartbeat, now):
+    # Giống LessonProgressUpdateSerializer.update
+    received_at = heartbeat.get('received_at')
+    # Heartbeat ghi sau không hạ trạng thái: bài đã hoàn thành vẫn hoàn thành khi xem lại
+    if not (received_at and progress.status == LessonProgressStatus.COMPLETED):
+        progress.status = status_for_percentage(heartbeat['completion_percentage'])
+        progress.completion_percentage = heartbeat['completion_percentage']
+    progress.watch_time = heartbeat['watch_time']
+    # Heartbeat lấy từ bộ đệm ghi sau mang theo thời điểm nhận
+    progress.last_watched_at = received_at or now
+    progress.updated_at = now
+    if progress.status == LessonProgressStatus.IN_PROGRESS and not progress.started_at:
+        progress.started_at = now
+    if progress.status == LessonProgressStatus.COMPLETED and not progress.completed_at:
+        progress.completed_at = now
+
+
+def recount_course_progress(course_ids=None, batch_size=500):
+    """Recompute every CourseProgress (of the given courses) from LessonProgress. Returns the number of rows."""
+    lesson_progresses = LessonProgress.objects.all()
+    course_progresses = CourseProgress.objects.all()
+    if course_ids:
+        lesson_progresses = lesson_progresses.filter(lesson__chapter__course_id__in=course_ids)
+        course_progresses = course_progresses.filter(course_id__in=course_ids)
+
+    totals = {}
+    rows = lesson_progresses.values('user_id', 'lesson__chapter__course_id').annotate(
+        completed=Count('id', filter=Q(status=LessonProgressStatus.COMPLETED) & published_lessons_q('lesson__')),
+        watch_time=Sum('watch_time'),
+    ).order_by()
+    for row in rows:
+        totals[row['user_id'], row['lesson__chapter__course_id']] = (row['completed'], row['watch_time'] or 0)
+
+    # Tổng số bài học lấy từ Course (được duy trì theo nội dung khóa học)
+    course_totals = dict(Course.objects.filter(pk__in=course_progresses.values('course_id'))
+                         .values_list('pk', 'published_lesson_count'))
+    fields = ['total_lessons', 'completed_lessons', 'total_watch_time', 'completion_percentage']
+    count, batch = 0, []
+    for progress in course_progresses.only('pk', 'user_id', 'course_id').iterator(chunk_size=batch_size):
+        completed, watch_time = totals.get((progress.user_id, progress.course_id), (0, 0))
+        total = course_totals.get(progress.course_id, 0)
+        progress.total_lessons, progress.completed_lessons, progress.total_watch_time = total, completed, watch_time
+        progress.completion_percentage = completed / total * 100 if total else 0
+        batch.append(progress)
+        if len(batch) >= batch_size:
+            count += _save_batch(batch, fields)
+    if batch:
+        count += _save_batch(batch, fields)
+    return count
+
+
+def _save_batch(batch, fields):
+    with transaction.atomic():
+        CourseProgress.objects.bulk_update(batch, fields)
+    saved = len(batch)
+    batch.clear()
+    return saved
@@ -0,0 +1,190 @@
+"""
+Write-behind buffer for watch-time heartbeats.
+
+Each user has a hash lesson_id -> latest heartbeat (JSON) plus an entry in the set of dirty users; flush()
+coalesces them and writes through progress.apply_heartbeats. Heartbeats that complete a lesson skip the buffer,
+so status transitions are written immediately.
+"""
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courses.models import LessonProgressStatus
+from courses.services import progress
+
+USERS_KEY = 'progress-buffer:users'
+
+logger = logging.getLogger(__name__)
+
+_buffers = {}
+
+
+def _user_key(user_id):
+    return f'progress-buffer:{user_id}'
+
+
+def _dump(heartbeat):
+    return json.dumps({
+        'lesson_id': heartbeat['lesson_id'],
+        'watch_time': heartbeat['watch_time'],
+        'completion_percentage': heartbeat['completion_percentage'],
+        'client_ts': heartbeat['client_ts'].isoformat() if heartbeat.get('client_ts') else None,
+        'received_at': heartbeat['received_at'].isoformat(),
+    })
+
+
+def _load(raw):
+    heartbeat = json.loads(raw)
+    for field in ('client_ts', 'received_at'):
+        heartbeat[field] = parse_datetime(heartbeat[field]) if heartbeat[field] else None
+    return heartbeat
+
+
+class LocalBuffer:
+    """In-process stand-in for tests and single-process development: other processes do not see it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def push(self, user_id, heartbeats):
+        with self._lock:
+            self._users.setdefault(user_id, {}).update((h['lesson_id'], _dump(h)) for h in heartbeats)
+
+    def discard(self, user_id, lesson_ids):
+        with self._lock:
+            pending = self._users.get(user_id, {})
+            for lesson_id in lesson_ids:
+                pending.pop(lesson_id, None)
+
+    def pop_users(self, count):
+        with self._lock:
+            return list(self._users)[:count]
+
+    def take(self, user_id):
+        with self._lock:
+            return [_load(raw) for raw in self._users.pop(user_id, {}).values()]
+
+    def restore(self, user_id, heartbeats):
+        with self._lock:
+            pending = self._users.setdefault(user_id, {})
+            for heartbeat in heartbeats:
+                # Không ghi đè heartbeat mới hơn đến trong lúc flush
+                pending.setdefault(heartbeat['lesson_id'], _dump(heartbeat))
+
+
+class RedisBuffer:
+    def __init__(self, alias):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(alias)
+
+    def push(self, user_id, heartbeats):
+        pipe = self.client.pipeline()
+        pipe.hset(_user_key(user_id), mapping={h['lesson_id']: _dump(h) for h in heartbeats})
+        pipe.sadd(USERS_KEY, user_id)
+        pipe.execute()
+
+    def discard(self, user_id, lesson_ids):
+        self.client.hdel(_user_key(user_id), *lesson_ids)
+
+    def pop_users(self, count):
+        return [int(user_id) for user_id in self.client.spop(USERS_KEY, count) or []]
+
+    def take(self, user_id):
+        from redis.exceptions import ResponseError
+        # Đổi tên key trước khi đọc: heartbeat đến sau đó rơi vào hash mới, không bị xóa mất
+        flushing = f'{_user_key(user_id)}:flushing'
+        try:
+            self.client.rename(_user_key(user_id), flushing)
+        except ResponseError:
+            return []
+        pipe = self.client.pipeline()
+        pipe.hgetall(flushing)
+        pipe.delete(flushing)
+        return [_load(raw) for raw in pipe.execute()[0].values()]
+
+    def restore(self, user_id, heartbeats):
+        pipe = self.client.pipeline()
+        for heartbeat in heartbeats:
+            pipe.hsetnx(_user_key(user_id), heartbeat['lesson_id'], _dump(heartbeat))
+        pipe.sadd(USERS_KEY, user_id)
+        pipe.execute()
+
+
+def get_buffer():
+    """The configured buffer (settings.PROGRESS_WRITE_BEHIND), None when heartbeats are written through."""
+    backend = settings.PROGRESS_WRITE_BEHIND
+    if not backend:
+        return None
+    if backend not in _buffers:
+        _buffers[backend] = LocalBuffer() if backend == 'local' else RedisBuffer(settings.PROGRESS_BUFFER_CACHE)
+    return _buffers[backend]
+
+
+def buffer_heartbeats(user_id, heartbeats):
+    """
+    Validate a batch now, write heartbeats that complete a lesson and buffer the others.
+    Returns (processed lesson ids, rejected, buffered lesson ids, affected course ids).
+    """
+    buffer = get_buffer()
+    latest, lessons, rejected = progress.validate_heartbeats(user_id, heartbeats)
+    now = timezone.now()
+    completed = {lesson_id: heartbeat for lesson_id, heartbeat in latest.items()
+                 if progress.status_for_percentage(heartbeat['completion_percentage']) == LessonProgressStatus.COMPLETED}
+    deferred = [dict(heartbeat, received_at=now) for lesson_id, heartbeat in latest.items()
+                if lesson_id not in completed]
+    if completed:
+        # Bản cũ hơn còn trong bộ đệm không được ghi đè lên trạng thái hoàn thành
+        buffer.discard(user_id, list(completed))
+        progress.write_heartbeats(user_id, completed, lessons)
+    if deferred:
+        buffer.push(user_id, deferred)
+    return (list(latest), rejected, [heartbeat['lesson_id'] for heartbeat in deferred],
+            {lessons[lesson_id].course_id for lesson_id in latest})
+
+
+def discard(user_id, lesson_ids):
+    """Drop buffered heartbeats superseded by a direct write."""
+    buffer = get_buffer()
+    if buffer is not None:
+        buffer.discard(user_id, lesson_ids)
+
+
+def flush(batch_size=500, max_users=None):
+    """
+    Write buffered heartbeats user by user. Returns (flushed users, written lessons).
+    A user whose write fails is logged and put back in the buffer once the run ends, the others are still written.
+    """
+    buffer = get_buffer()
+    users = lessons = 0
+    failed = []
+    try:
+        while max_users is None or users < max_users:
+            user_ids = buffer.pop_users(batch_size)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                heartbeats = []
+                try:
+                    heartbeats = buffer.take(user_id)
+                    if not heartbeats:
+                        continue
+                    processed, rejected, _ = progress.apply_heartbeats(user_id, heartbeats)
+                except Exception:
+                    logger.exception("Flushing buffered progress of user %s failed", user_id)
+                    failed.append((user_id, heartbeats))
+                    continue
+                if rejected:
+                    # Bài học bị xóa hoặc học viên mất quyền học sau khi heartbeat được nhận
+                    logger.warning("Dropped buffered progress of user %s: %s", user_id, rejected)
+                users += 1
+                lessons += len(processed)
+    finally:
+        # Trả lại sau vòng lặp để lỗi lặp lại không bị flush mãi trong cùng một lần chạy
+        for user_id, heartbeats in failed:
+            buffer.restore(user_id, heartbeats)
+    return users, lessons
@@ -0,0 +1,139 @@
+"""
+"Students who took this also took": cosine similarity over the course x course co-enrollment matrix.
+
+The matrix is never materialised densely: every (course, other course) pair taken by the same student is
+encoded as course_index * n_courses + other_index and counted with np.unique, user block by user block.
+"""
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from courses.models import RelatedCourse, UserCourse
+from courses.services.caching import get_versions
+from courses.services.enrollment import PAID_STATUSES, students_version_name
+
+# Học viên đăng ký quá nhiều khóa học gần như không mang thông tin, lại sinh ra số cặp bình phương
+MAX_COURSES_PER_USER = 200
+# Số cặp tối đa xử lý trong một khối người dùng
+PAIRS_PER_BLOCK = 5_000_000
+
+
+def load_enrollments():
+    """(user_ids, course_ids) int64 arrays of paid enrollments in active courses."""
+    rows = UserCourse.objects.filter(status__in=PAID_STATUSES, course__active=True) \
+        .values_list('user_id', 'course_id').order_by().iterator(chunk_size=10000)
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64)
+    return flat[0::2], flat[1::2]
+
+
+def _pair_codes(course_idx, sizes, n_courses):
+    """Codes of every ordered pair of distinct courses within each user group (rows sorted by user)."""
+    row_sizes = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(course_idx.size), row_sizes)
+    group_starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    # Vị trí trong nhóm: 0..size-1 lặp lại cho từng dòng của nhóm
+    row_starts = np.repeat(np.cumsum(row_sizes) - row_sizes, row_sizes)
+    right = np.repeat(group_starts, row_sizes) + (np.arange(left.size) - row_starts)
+    keep = left != right
+    return course_idx[left[keep]] * n_courses + course_idx[right[keep]]
+
+
+def _block_rows(starts, sizes):
+    # Chỉ số các dòng của những nhóm user [start, start + size)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.repeat(starts, sizes) + offsets
+
+
+def co_enrollment_counts(user_ids, course_ids):
+    """
+    Sparse co-enrollment matrix as (course_ids, row, col, count, course_totals):
+    row / col index course_ids, course_totals[i] is the number of students of course i.
+    """
+    course_values, course_idx = np.unique(course_ids, return_inverse=True)
+    n_courses = course_values.size
+    if not n_courses:
+        empty = np.array([], dtype=np.int64)
+        return course_values, empty, empty, empty, empty
+    # Bỏ đăng ký trùng (user, course) rồi nhóm theo user
+    pairs = np.unique(user_ids * n_courses + course_idx)
+    users, course_idx = pairs // n_courses, pairs % n_courses
+    course_totals = np.bincount(course_idx, minlength=n_courses)
+
+    _, user_starts, sizes = np.unique(users, return_index=True, return_counts=True)
+    kept = sizes <= MAX_COURSES_PER_USER
+    user_starts, sizes = user_starts[kept], sizes[kept]
+
+    codes, counts = [], []
+    block_pairs = np.cumsum(sizes.astype(np.int64) ** 2)
+    start = 0
+    while start < sizes.size:
+        limit = (block_pairs[start - 1] if start else 0) + PAIRS_PER_BLOCK
+        end = max(int(np.searchsorted(block_pairs, limit, side='right')), start + 1)
+        rows = _block_rows(user_starts[start:end], sizes[start:end])
+        block_codes, block_counts = np.unique(_pair_codes(course_idx[rows], sizes[start:end], n_courses),
+                                              return_counts=True)
+        codes.append(block_codes)
+        counts.append(block_counts)
+        start = end
+
+    if not codes:
+        empty = np.array([], dtype=np.int64)
+        return course_values, empty, empty, empty, course_totals
+    codes, counts = np.concatenate(codes), np.concatenate(counts)
+    # Gộp kết quả của các khối
+    order = np.argsort(codes, kind='stable')
+    codes, counts = codes[order], counts[order]
+    unique_codes, starts = np.unique(codes, return_index=True)
+    counts = np.add.reduceat(counts, starts)
+    return course_values, unique_codes // n_courses, unique_codes % n_courses, counts, course_totals
+
+
+def top_k_similar(user_ids, course_ids, top_k, min_common=1):
+    """(course_id, related_id, score, rank) arrays: the top_k most similar courses of each course by cosine."""
+    course_values, row, col, counts, totals = co_enrollment_counts(user_ids, course_ids)
+    keep = counts >= min_common
+    row, col, counts = row[keep], col[keep], counts[keep]
+    scores = counts / np.sqrt(totals[row].astype(np.float64) * totals[col])
+
+    # Theo khóa học tăng dần, điểm giảm dần, hòa điểm thì id nhỏ trước
+    order = np.lexsort((course_values[col], -scores, row))
+    row, col, scores = row[order], col[order], scores[order]
+    group_starts = np.searchsorted(row, row, side='left')
+    ranks = np.arange(row.size) - group_starts
+    keep = ranks < top_k
+    return course_values[row[keep]], course_values[col[keep]], scores[keep], ranks[keep]
+
+
+def rebuild_related_courses(top_k=None, min_common=1, batch_size=2000):
+    """Recompute and store the related courses of every course. Returns the number of stored pairs."""
+    top_k = top_k or settings.RELATED_COURSES_TOP_K
+    course_ids, related_ids, scores, ranks = top_k_similar(*load_enrollments(), top_k, min_common)
+    related = [
+        RelatedCourse(course_id=int(course_id), related_id=int(related_id), score=float(score), rank=int(rank))
+        for course_id, related_id, score, rank in zip(course_ids, related_ids, scores, ranks)
+    ]
+    with transaction.atomic():
+        RelatedCourse.objects.all().delete()
+        RelatedCourse.objects.bulk_create(related, batch_size=batch_size)
+    return len(related)
+
+
+def build_marker(kwargs=None):
+    """
+    Latest RelatedCourse id. Every rebuild deletes and re-creates the rows, so it changes with each build
+    and, unlike a cache version, is seen by the web workers whichever process ran the command.
+    """
+    return RelatedCourse.objects.aggregate(marker=Max('pk'))['marker']
+
+
+def etag_validator(kwargs):
+    """
+    ETag part of a course's related list: the build marker plus the student versions of the listed courses,
+    whose counters (total_student) change through F() UPDATEs without touching Course or RelatedCourse.
+    """
+    related_ids = RelatedCourse.objects.filter(course_id=kwargs['pk']).values_list('related_id', flat=True) \
+        if str(kwargs['pk']).isdigit() else []
+    return build_marker(), get_versions(*[students_version_name(related_id) for related_id in related_ids])
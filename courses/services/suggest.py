@@ -0,0 +1,235 @@
+"""
+Typeahead over folded course names, subjects and teacher names.
+
+The index is a sorted list of keys (every word suffix of each folded text, so 'python' finds
+'Lập trình Python') searched with bisect. The snapshot is shared by all workers through the cache and
+each process keeps its unpickled copy. Saves only log the changed ids under the next suggest version;
+processes replay the log onto their copy and one of them rewrites the snapshot every COMPACT_AFTER changes.
+"""
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from courses.models import Course, User
+from courses.search import fold_text
+from courses.services.caching import bump_version, get_versions
+
+SUGGEST_VERSION = 'suggest_index'
+SUGGEST_INDEX_KEY = 'suggest-index'
+SUGGEST_SNAPSHOT_KEY = 'suggest-index:snapshot-version'
+SUGGEST_CHANGE_KEY = 'suggest-index:change'
+SUGGEST_LOCK_KEY = 'suggest-index:lock'
+# Số từ tối đa lấy hậu tố cho mỗi chuỗi, và số key duyệt tối đa cho một truy vấn
+MAX_WORDS = 8
+MAX_SCAN = 2000
+# Số thay đổi tối đa phát lại trên một bản sao trước khi dựng lại từ DB, và chu kỳ ghi lại snapshot
+MAX_CHANGES = 5000
+COMPACT_AFTER = 200
+
+_local = {'version': None, 'snapshot': None, 'index': None}
+
+
+def _keys_for(texts):
+    keys = set()
+    for text in texts:
+        words = fold_text(text).split()[:MAX_WORDS]
+        keys.update((' '.join(words[i:]), i) for i in range(len(words)))
+    return sorted(keys)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys = []
+        # Song song với keys: (item, vị trí từ bắt đầu khớp)
+        self.refs = []
+        # item ('course' | 'teacher', id) -> (label, weight, keys)
+        self.items = {}
+
+    def add(self, item, texts, label, weight=0):
+        self.remove(item)
+        keys = _keys_for(texts)
+        self.items[item] = (label, weight, keys)
+        for key, offset in keys:
+            position = bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.refs.insert(position, (item, offset))
+
+    def extend(self, entries):
+        """Bulk add of (item, texts, label, weight) tuples with a single sort, for full builds."""
+        pairs = list(zip(self.keys, self.refs))
+        for item, texts, label, weight in entries:
+            self.remove(item)
+            keys = _keys_for(texts)
+            self.items[item] = (label, weight, keys)
+            pairs.extend((key, (item, offset)) for key, offset in keys)
+        pairs.sort(key=lambda pair: pair[0])
+        self.keys = [key for key, _ in pairs]
+        self.refs = [ref for _, ref in pairs]
+
+    def remove(self, item):
+        if item not in self.items:
+            return
+        for key, offset in self.items.pop(item)[2]:
+            position = bisect_left(self.keys, key)
+            while self.keys[position] == key and self.refs[position] != (item, offset):
+                position += 1
+            del self.keys[position]
+            del self.refs[position]
+
+    def search(self, query, limit=10):
+        query = fold_text(query)
+        if not query:
+            return []
+        best = {}
+        position = bisect_left(self.keys, query)
+        end = min(len(self.keys), position + MAX_SCAN)
+        while position < end and self.keys[position].startswith(query):
+            item, offset = self.refs[position]
+            best[item] = min(offset, best.get(item, offset))
+            position += 1
+        # Khớp từ đầu tên trước, sau đó theo độ phổ biến
+        ranked = sorted(best, key=lambda item: (best[item] > 0, -self.items[item][1], self.items[item][0]))
+        return [{'type': item[0], 'id': item[1], 'label': self.items[item][0]} for item in ranked[:limit]]
+
+
+# Cột được đưa vào index: lưu mà không đổi các cột này thì không cần cập nhật
+COURSE_FIELDS = ('name', 'subject', 'active', 'lecturer_id')
+TEACHER_FIELDS = ('first_name', 'last_name')
+
+
+def indexed_values(instance, fields):
+    # Đọc qua __dict__ để không nạp lại cột bị defer
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+def _teachers(queryset):
+    return queryset.filter(Exists(Course.objects.filter(lecturer=OuterRef('pk'), active=True)))
+
+
+def _course_entry(pk, name, subject, student_count):
+    return ('course', pk), [name, subject], name, student_count
+
+
+def _teacher_entry(pk, first_name, last_name):
+    label = f'{last_name} {first_name}'.strip()
+    return ('teacher', pk), [label], label, 0
+
+
+def build_index():
+    index = SuggestIndex()
+    courses = Course.objects.filter(active=True).values_list('pk', 'name', 'subject', 'student_count')
+    teachers = _teachers(User.objects.all()).values_list('pk', 'first_name', 'last_name')
+    index.extend([_course_entry(*row) for row in courses] + [_teacher_entry(*row) for row in teachers])
+    return index
+
+
+def _patch(index, course_ids, teacher_ids):
+    """Re-read the given courses / teachers from the DB into index (idempotent, so changes may be replayed)."""
+    courses = Course.objects.filter(pk__in=course_ids, active=True) \
+        .values_list('pk', 'name', 'subject', 'student_count')
+    teachers = _teachers(User.objects.filter(pk__in=teacher_ids)).values_list('pk', 'first_name', 'last_name')
+    for pk in course_ids:
+        index.remove(('course', pk))
+    for pk in teacher_ids:
+        index.remove(('teacher', pk))
+    entries = [_course_entry(*row) for row in courses] + [_teacher_entry(*row) for row in teachers]
+    if len(entries) > 100:
+        # Import hàng loạt: sắp xếp lại một lần thay vì chèn từng key
+        index.extend(entries)
+    else:
+        for entry in entries:
+            index.add(*entry)
+
+
+def _change_key(version):
+    return f'{SUGGEST_CHANGE_KEY}:{version}'
+
+
+def _replay(index, start, version):
+    """
+    Apply the changes logged after start up to version. Returns the last version applied:
+    a change whose key is not written yet stops the replay, None when one is lost (rebuild needed).
+    """
+    if not 0 <= version - start <= MAX_CHANGES:
+        return None
+    keys = [_change_key(number) for number in range(start + 1, version + 1)]
+    changes = cache.get_many(keys)
+    applied = start
+    course_ids, teacher_ids = set(), set()
+    for key in keys:
+        if key not in changes:
+            break
+        course_ids.update(changes[key][0])
+        teacher_ids.update(changes[key][1])
+        applied += 1
+    if any(key in changes for key in keys[applied - start:]):
+        return None
+    if course_ids or teacher_ids:
+        _patch(index, course_ids, teacher_ids)
+    return applied
+
+
+def _load(version):
+    snapshot = cache.get(SUGGEST_INDEX_KEY)
+    if snapshot is not None:
+        snapshot_version, index = snapshot
+        applied = _replay(index, snapshot_version, version)
+        if applied is not None:
+            _local.update(version=applied, snapshot=snapshot_version, index=index)
+            return
+    # Đọc version trước khi dựng: mọi thay đổi đã commit tới version này đều có trong DB
+    index = build_index()
+    cache.set(SUGGEST_INDEX_KEY, (version, index), settings.SUGGEST_INDEX_TIMEOUT)
+    cache.set(SUGGEST_SNAPSHOT_KEY, version, settings.SUGGEST_INDEX_TIMEOUT)
+    _local.update(version=version, snapshot=version, index=index)
+
+
+def _compact():
+    """Store this process' patched copy as the new snapshot once enough changes piled up on the old one."""
+    if _local['version'] - _local['snapshot'] < COMPACT_AFTER:
+        return
+    snapshot_version = cache.get(SUGGEST_SNAPSHOT_KEY)
+    if snapshot_version is not None and _local['version'] - snapshot_version < COMPACT_AFTER:
+        # Process khác đã ghi snapshot mới hơn
+        _local['snapshot'] = snapshot_version
+        return
+    if not cache.add(SUGGEST_LOCK_KEY, 1, timeout=10):
+        return
+    try:
+        cache.set(SUGGEST_INDEX_KEY, (_local['version'], _local['index']), settings.SUGGEST_INDEX_TIMEOUT)
+        cache.set(SUGGEST_SNAPSHOT_KEY, _local['version'], settings.SUGGEST_INDEX_TIMEOUT)
+        _local['snapshot'] = _local['version']
+    finally:
+        cache.delete(SUGGEST_LOCK_KEY)
+
+
+def get_index():
+    version = get_versions(SUGGEST_VERSION)[0]
+    if _local['version'] != version:
+        applied = None
+        if _local['index'] is not None:
+            applied = _replay(_local['index'], _local['version'], version)
+        if applied is None:
+            _load(version)
+        else:
+            _local['version'] = applied
+        _compact()
+    return _local['index']
+
+
+def suggest(query, limit=10):
+    return get_index().search(query, limit)
+
+
+def refresh_items(course_ids=(), teacher_ids=()):
+    """
+    Log that the given courses / teachers changed (call after commit). Only the ids are written:
+    each process re-reads them into its copy of the index, the snapshot is rewritten every COMPACT_AFTER changes.
+    """
+    course_ids, teacher_ids = set(course_ids) - {None}, set(teacher_ids) - {None}
+    if not course_ids and not teacher_ids:
+        return
+    version = bump_version(SUGGEST_VERSION)
+    cache.set(_change_key(version), (course_ids, teacher_ids), settings.SUGGEST_INDEX_TIMEOUT)
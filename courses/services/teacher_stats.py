@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import Avg, Count, F, Sum
+
+from courses.models import Course, TeacherStats
+
+
+def _aggregate(queryset):
+    return queryset.aggregate(course_count=Count('id'), student_count=Sum('student_count'),
+                              average_price=Avg('price'))
+
+
+def _stats_values(values):
+    return {
+        'course_count': values['course_count'] or 0,
+        'student_count': values['student_count'] or 0,
+        'average_price': round(values['average_price'] or 0, 2),
+    }
+
+
+def refresh_teacher_stats(teacher_ids):
+    """Recompute the stats of the given teachers from their active courses."""
+    for teacher_id in set(teacher_ids) - {None}:
+        values = _aggregate(Course.objects.filter(lecturer_id=teacher_id, active=True))
+        if not values['course_count']:
+            # Không còn khóa học: bỏ dòng thống kê (cũng tránh tạo lại khi đang xóa User theo cascade)
+            TeacherStats.objects.filter(teacher_id=teacher_id).delete()
+            continue
+        TeacherStats.objects.update_or_create(teacher_id=teacher_id, defaults=_stats_values(values))
+
+
+def apply_student_delta(course_id, delta):
+    # Một câu UPDATE, không cần nạp Course để biết giảng viên
+    TeacherStats.objects.filter(teacher__lectures__id=course_id, teacher__lectures__active=True) \
+        .update(student_count=F('student_count') + delta)
+
+
+def rebuild_teacher_stats(batch_size=500):
+    """Rebuild every teacher's stats with one grouped query. Returns the number of teachers."""
+    rows = Course.objects.filter(active=True, lecturer__isnull=False).values('lecturer_id') \
+        .annotate(course_count=Count('id'), student_count=Sum('student_count'), average_price=Avg('price')) \
+        .order_by()
+    stats = [TeacherStats(teacher_id=row['lecturer_id'], **_stats_values(row)) for row in rows]
+    with transaction.atomic():
+        TeacherStats.objects.all().delete()
+        TeacherStats.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
@@ -0,0 +1,251 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from courses.models import Category, Chapter, Course, Document, Lesson, LessonProgress, User, UserCourse
+from courses.search import build_search_text
+from courses.services import course_totals, course_tree, images, leaderboard, lesson_map, progress, suggest, teacher_stats
+from courses.services.caching import bump_version_on_commit
+from courses.services.enrollment import apply_enrollment_change, invalidate_memberships, students_version_name
+
+# Model -> tên version dùng làm khóa cache (xem courses/services/caching.py)
+VERSIONED_MODELS = {
+    Course: 'course',
+    Category: 'category',
+    UserCourse: 'user_course',
+    User: 'user',
+}
+
+# Nội dung khóa học -> khóa ngoại tới cấp cha
+TREE_PARENTS = {
+    Chapter: 'course_id',
+    Lesson: 'chapter_id',
+    Document: 'lesson_id',
+}
+
+
+@receiver(pre_save, sender=Course)
+def update_course_search_text(sender, instance, **kwargs):
+    instance.search_text = build_search_text(instance)
+
+
+@receiver(pre_save, sender=Course)
+def update_course_image_variants(sender, instance, **kwargs):
+    instance.image_variants = images.build_variants(instance, 'image')
+
+
+@receiver(pre_save, sender=User)
+def update_avatar_variants(sender, instance, **kwargs):
+    if _is_last_login_only(sender, kwargs):
+        return
+    instance.avatar_variants = images.build_variants(instance, 'avatar')
+
+
+@receiver(post_init, sender=UserCourse)
+def remember_user_course_state(sender, instance, **kwargs):
+    # Trạng thái đã được tính vào bộ đếm (giá trị đang lưu trong DB); đọc qua __dict__ để không nạp cột bị defer
+    values = instance.__dict__
+    if instance.pk and 'course_id' in values and 'status' in values:
+        instance._counted_state = (values['course_id'], values['status'])
+    elif instance.pk:
+        instance._counted_state = None
+    else:
+        instance._counted_state = (None, None)
+    instance._loaded_user_id = values.get('user_id')
+
+
+@receiver(pre_save, sender=UserCourse)
+@receiver(pre_delete, sender=UserCourse)
+def load_user_course_state(sender, instance, **kwargs):
+    # Instance nạp với only() / defer(): đọc trạng thái đang lưu trong DB trước khi bị ghi đè
+    if instance._counted_state is None:
+        instance._counted_state = UserCourse.objects.filter(pk=instance.pk) \
+            .values_list('course_id', 'status').first() or (None, None)
+    if kwargs.get('signal') is pre_delete and instance.get_deferred_fields():
+        # Sau khi xóa không còn dòng để nạp cột bị defer
+        instance.refresh_from_db(fields=instance.get_deferred_fields())
+        instance._loaded_user_id = instance.user_id
+
+
+@receiver(post_save, sender=UserCourse)
+def update_course_counters_on_save(sender, instance, **kwargs):
+    old_course_id, old_status = instance._counted_state
+    new_state = (instance.course_id, instance.status)
+    if (old_course_id, old_status) != new_state:
+        apply_enrollment_change(old_course_id, old_status, *new_state)
+        for course_id in {old_course_id, instance.course_id} - {None}:
+            bump_version_on_commit(students_version_name(course_id))
+        transaction.on_commit(lambda: leaderboard.record_enrollment_change(
+            old_course_id, old_status, *new_state, instance.created_at))
+        instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=UserCourse)
+def update_course_counters_on_delete(sender, instance, **kwargs):
+    old_course_id, old_status = instance._counted_state
+    apply_enrollment_change(old_course_id, old_status, None, None)
+    if old_course_id:
+        bump_version_on_commit(students_version_name(old_course_id))
+    transaction.on_commit(lambda: leaderboard.record_enrollment_change(
+        old_course_id, old_status, None, None, instance.created_at))
+    instance._counted_state = (None, None)
+
+
+@receiver(post_save, sender=UserCourse)
+@receiver(post_delete, sender=UserCourse)
+def invalidate_enrollment_memberships(sender, instance, **kwargs):
+    # Gồm cả update_status_user_course (IPN MoMo), vốn lưu qua save()
+    user_ids = {instance._loaded_user_id, instance.user_id} - {None}
+    transaction.on_commit(lambda: invalidate_memberships(user_ids))
+    instance._loaded_user_id = instance.user_id
+
+
+def bump_table_version(sender, instance, **kwargs):
+    # Lưu last_login khi đăng nhập không ảnh hưởng dữ liệu được cache
+    if _is_last_login_only(sender, kwargs):
+        return
+    bump_version_on_commit(VERSIONED_MODELS[sender])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=model, dispatch_uid=f'bump_version_save_{model.__name__}')
+    post_delete.connect(bump_table_version, sender=model, dispatch_uid=f'bump_version_delete_{model.__name__}')
+
+
+def _is_last_login_only(sender, kwargs):
+    return sender is User and kwargs.get('update_fields') == frozenset(['last_login'])
+
+
+def remember_tree_parent(sender, instance, **kwargs):
+    instance._tree_parent_id = getattr(instance, TREE_PARENTS[sender])
+
+
+def invalidate_course_tree(sender, instance, **kwargs):
+    # Cả khóa học cũ lẫn mới khi chương/bài/tài liệu bị chuyển sang chỗ khác
+    parent_ids = {instance._tree_parent_id, getattr(instance, TREE_PARENTS[sender])}
+    course_tree.bump_course_trees(course_tree.course_ids_for(sender, parent_ids))
+
+
+for model in TREE_PARENTS:
+    post_init.connect(remember_tree_parent, sender=model, dispatch_uid=f'tree_parent_{model.__name__}')
+    post_save.connect(invalidate_course_tree, sender=model, dispatch_uid=f'tree_save_{model.__name__}')
+    post_delete.connect(invalidate_course_tree, sender=model, dispatch_uid=f'tree_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def invalidate_lesson_map(sender, instance, **kwargs):
+    lesson_map.invalidate()
+
+
+@receiver(post_init, sender=Lesson)
+@receiver(post_init, sender=Chapter)
+def remember_publication(sender, instance, **kwargs):
+    values = instance.__dict__
+    instance._loaded_publication = (values.get('is_published'), values.get('active')) if instance.pk else None
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def refresh_course_lesson_totals(sender, instance, **kwargs):
+    parent_id = getattr(instance, TREE_PARENTS[sender])
+    publication = (instance.is_published, instance.active)
+    # Bài học đã có tiến độ đổi trạng thái xuất bản hoặc chuyển chỗ: phải đếm lại số bài đã hoàn thành.
+    # Khi xóa, LessonProgress bị xóa theo cascade đã tự trừ delta.
+    recount = kwargs.get('created') is False and (instance._tree_parent_id != parent_id
+                                                  or instance._loaded_publication != publication)
+    course_ids = course_tree.course_ids_for(sender, {instance._tree_parent_id, parent_id})
+    course_totals.refresh_course_totals(course_ids, recount_progress=recount)
+    instance._loaded_publication = publication
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_own_course_tree(sender, instance, **kwargs):
+    course_tree.bump_course_trees([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def invalidate_lecturer_course_trees(sender, instance, **kwargs):
+    if _is_last_login_only(sender, kwargs):
+        return
+    course_tree.bump_course_trees(Course.objects.filter(lecturer=instance).values_list('pk', flat=True))
+
+
+@receiver(post_init, sender=Course)
+def remember_course_lecturer(sender, instance, **kwargs):
+    # Đọc qua __dict__ để không nạp lại cột bị defer (sparse fieldsets)
+    instance._loaded_lecturer_id = instance.__dict__.get('lecturer_id')
+
+
+@receiver(post_init, sender=Course)
+def remember_course_suggest_values(sender, instance, **kwargs):
+    instance._loaded_suggest_values = suggest.indexed_values(instance, suggest.COURSE_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_teacher_suggest_values(sender, instance, **kwargs):
+    instance._loaded_suggest_values = suggest.indexed_values(instance, suggest.TEACHER_FIELDS)
+
+
+def _suggest_values_changed(instance, fields, kwargs):
+    values = suggest.indexed_values(instance, fields)
+    changed = kwargs.get('created') is not False or values != instance._loaded_suggest_values
+    instance._loaded_suggest_values = values
+    return changed
+
+
+# Đăng ký trước refresh_lecturer_stats để còn đọc được giảng viên cũ
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def refresh_course_suggestions(sender, instance, **kwargs):
+    if not _suggest_values_changed(instance, suggest.COURSE_FIELDS, kwargs):
+        return
+    course_id, teacher_ids = instance.pk, [instance._loaded_lecturer_id, instance.lecturer_id]
+    transaction.on_commit(lambda: suggest.refresh_items([course_id], teacher_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_teacher_suggestions(sender, instance, **kwargs):
+    if not _suggest_values_changed(instance, suggest.TEACHER_FIELDS, kwargs):
+        return
+    teacher_id = instance.pk
+    transaction.on_commit(lambda: suggest.refresh_items(teacher_ids=[teacher_id]))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def refresh_lecturer_stats(sender, instance, **kwargs):
+    teacher_stats.refresh_teacher_stats([instance._loaded_lecturer_id, instance.lecturer_id])
+    instance._loaded_lecturer_id = instance.lecturer_id
+
+
+@receiver(post_init, sender=LessonProgress)
+def remember_lesson_progress_state(sender, instance, **kwargs):
+    # Giá trị đã được cộng vào CourseProgress; đọc qua __dict__ để không nạp cột bị defer
+    values = instance.__dict__
+    if instance.pk is None:
+        instance._counted_state = None
+    elif all(name in values for name in ('lesson_id', 'status', 'watch_time')):
+        instance._counted_state = (values['lesson_id'], values['status'], values['watch_time'])
+    else:
+        instance._counted_state = progress.UNKNOWN_STATE
+
+
+@receiver(post_save, sender=LessonProgress)
+def update_course_progress_on_save(sender, instance, **kwargs):
+    # Gọi cả khi trạng thái không đổi: updated_at của CourseProgress phải theo kịp LessonProgress (xem is_stale)
+    new_state = (instance.lesson_id, instance.status, instance.watch_time)
+    progress.apply_lesson_progress_change(instance.user_id, instance._counted_state, new_state)
+    instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=LessonProgress)
+def update_course_progress_on_delete(sender, instance, **kwargs):
+    progress.apply_lesson_progress_change(instance.user_id, instance._counted_state, None)
+    instance._counted_state = None
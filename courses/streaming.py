@@ -0,0 +1,137 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+# Các backend đọc được kết quả từng phần bằng server-side cursor; PyMySQL/mysqlclient thì tải hết vào bộ nhớ
+STREAMING_VENDORS = ('postgresql', 'oracle', 'sqlite')
+
+
+def _keyset_columns(queryset):
+    """
+    (field, descending) pairs of the queryset ordering followed by pk, or None when some ordering term
+    is not a plain local column (expressions, related lookups, random order).
+    """
+    opts = queryset.model._meta
+    ordering = queryset.query.order_by or (opts.ordering if queryset.query.default_ordering else ())
+    columns = []
+    for term in ordering:
+        if not isinstance(term, str) or term == '?' or LOOKUP_SEP in term:
+            return None
+        name = term.lstrip('-')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        columns.append((field, term.startswith('-')))
+    if not any(field.primary_key for field, _ in columns):
+        columns.append((opts.pk, False))
+    return columns
+
+
+def _after(columns, values):
+    """Rows strictly after values in the ordering; NULL counts as the smallest value."""
+    condition = Q(pk__in=[])
+    prefix = Q()
+    for (field, descending), value in zip(columns, values):
+        column = field.attname
+        if value is None:
+            # NULL đứng đầu khi tăng dần, đứng cuối khi giảm dần
+            if not descending:
+                condition |= prefix & Q(**{f'{column}__isnull': False})
+            prefix &= Q(**{f'{column}__isnull': True})
+        else:
+            after = Q(**{f'{column}__{"lt" if descending else "gt"}': value})
+            if descending and field.null:
+                after |= Q(**{f'{column}__isnull': True})
+            condition |= prefix & after
+            prefix &= Q(**{column: value})
+    return condition
+
+
+def _keyset_chunks(queryset, columns, chunk_size):
+    ordering = [F(field.attname).desc(nulls_last=True) if descending else F(field.attname).asc(nulls_first=True)
+                for field, descending in columns]
+    queryset = queryset.order_by(*ordering)
+    last_values = None
+    while True:
+        chunk_queryset = queryset if last_values is None else queryset.filter(_after(columns, last_values))
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        last_values = [getattr(chunk[-1], field.attname) for field, _ in columns]
+        yield chunk
+
+
+def _iterator_chunks(queryset, chunk_size):
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _offset_chunks(queryset, chunk_size):
+    offset = 0
+    while True:
+        chunk = list(queryset[offset:offset + chunk_size])
+        if not chunk:
+            return
+        offset += len(chunk)
+        yield chunk
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Lists of at most chunk_size objects, in the queryset order. Each chunk is its own small query keyed on
+    the ordering columns plus pk; orderings that cannot be keyed go through iterator() where the backend
+    streams results, and through LIMIT/OFFSET slices elsewhere. prefetch_related is applied per chunk.
+    """
+    columns = _keyset_columns(queryset)
+    if columns is not None:
+        return _keyset_chunks(queryset, columns, chunk_size)
+    if connections[queryset.db].vendor in STREAMING_VENDORS:
+        return _iterator_chunks(queryset, chunk_size)
+    return _offset_chunks(queryset, chunk_size)
+
+
+def iter_json_array(chunks, serialize):
+    """Encode a JSON array chunk by chunk: serialize(chunk) returns the list of dicts of one chunk."""
+    renderer = JSONRenderer()
+    yield b'['
+    first = True
+    for chunk in chunks:
+        # Bỏ cặp [] bao ngoài của từng chunk rồi nối lại bằng dấu phẩy
+        body = renderer.render(serialize(chunk))[1:-1]
+        if not body:
+            continue
+        if not first:
+            yield b','
+        yield body
+        first = False
+    yield b']'
+
+
+class StreamingListMixin:
+    """
+    list() of unpaginated JSON responses streams the array instead of building every dict first,
+    so worker memory stays bounded by stream_chunk_size rows.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json' or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = iter_chunks(queryset, self.stream_chunk_size)
+        content = iter_json_array(chunks, lambda chunk: self.get_serializer(chunk, many=True).data)
+        return StreamingHttpResponse(content, content_type='application/json')
@@ -1,3 +1,510 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Category, Chapter, Comment, Course, CourseProgress, CourseStatus, Forum, Lesson, \
+    LessonProgress, RelatedCourse, Role, TeacherStats, Topic, User, UserCourse
+from courses.services import caching, catalog_io, course_tree, enrollment, leaderboard, lesson_map, progress, \
+    progress_buffer, suggest
+from courses.services.enrollment import students_version_name
+from courses.streaming import iter_chunks
+
+
+class ProgressTestMixin:
+    def setUp(self):
+        cache.clear()
+        role = Role.objects.create(name='student')
+        self.teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        self.student = User.objects.create(username='student', email='student@example.com', userRole=role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def create_course(self, lessons=4, published=True):
+        # Version lesson map / tổng số bài học tăng sau commit
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(lecturer=self.teacher, subject='Lập trình', image='course.png',
+                                           name='Lập trình Python')
+            chapter = Chapter.objects.create(course=course, name='Chương 1', is_published=True)
+            lessons = [Lesson.objects.create(chapter=chapter, name=f'Bài {i}', duration=100, is_published=published)
+                       for i in range(lessons)]
+        return course, lessons
+
+    def enroll(self, course):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserCourse.objects.create(user=self.student, course=course, status=CourseStatus.IN_PROGRESS)
+
+    def update_progress(self, lesson, watch_time, percentage):
+        response = self.client.post('/lesson-progress/update-progress/', {
+            'lesson_id': lesson.pk, 'watch_time': watch_time, 'completion_percentage': percentage,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def counters(self, course):
+        course_progress = CourseProgress.objects.get(user=self.student, course=course)
+        return (course_progress.total_lessons, course_progress.completed_lessons, course_progress.total_watch_time,
+                round(course_progress.completion_percentage, 6))
+
+    def assertMatchesRecount(self, course):
+        """The counters maintained by deltas equal a full recount from LessonProgress."""
+        counters = self.counters(course)
+        progress.recount_course_progress([course.pk])
+        self.assertEqual(counters, self.counters(course))
+        return counters
+
+
+class CourseCounterTests(ProgressTestMixin, TestCase):
+    def counter_values(self, course):
+        return Course.objects.filter(pk=course.pk).values_list(*Course.COUNTER_FIELDS).get()
+
+    def test_saving_a_stale_course_keeps_counters(self):
+        course, _ = self.create_course(lessons=2)
+        stale = Course.objects.get(pk=course.pk)
+        self.enroll(course)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(chapter=course.chapters.get(), name='Bài mới', duration=50, is_published=True)
+        expected = self.counter_values(course)
+        self.assertEqual(expected, (1, 0, 1, 0, 3, 250))
+
+        stale.name = 'Python nâng cao'
+        stale.save()
+        self.assertEqual(self.counter_values(course), expected)
+        self.assertEqual(Course.objects.get(pk=course.pk).name, 'Python nâng cao')
+
+    def test_saving_a_deferred_course_only_writes_loaded_fields(self):
+        course, _ = self.create_course(lessons=1)
+        self.enroll(course)
+        deferred = Course.objects.only('id', 'name').get(pk=course.pk)
+        deferred.name = 'Đổi tên'
+        deferred.save()
+        course.refresh_from_db()
+        self.assertEqual((course.name, course.subject, course.student_count), ('Đổi tên', 'Lập trình', 1))
+
+    def test_enrollment_changes_match_recount(self):
+        course, _ = self.create_course(lessons=1)
+        other, _ = self.create_course(lessons=1)
+
+        def assertMatchesRecount():
+            counters = [self.counter_values(course), self.counter_values(other)]
+            enrollment.recount_students()
+            self.assertEqual(counters, [self.counter_values(course), self.counter_values(other)])
+            return counters
+
+        self.enroll(course)
+        user_course = UserCourse.objects.get(user=self.student, course=course)
+        self.assertEqual(assertMatchesRecount()[0][:4], (1, 0, 1, 0))
+        user_course.status = CourseStatus.COMPLETE
+        user_course.save()
+        self.assertEqual(assertMatchesRecount()[0][:4], (1, 0, 0, 1))
+        user_course.course = other
+        user_course.save()
+        self.assertEqual([counters[:4] for counters in assertMatchesRecount()], [(0, 0, 0, 0), (1, 0, 0, 1)])
+        user_course.delete()
+        self.assertEqual(assertMatchesRecount()[1][:4], (0, 0, 0, 0))
+
+
+class CourseFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        category = Category.objects.create(name='Lập trình')
+        for price in (None, 0, 499999, 500000, 1000000, 1500000, 2000000, 3000000):
+            Course.objects.create(lecturer=teacher, category=category, subject='Lập trình', image='course.png',
+                                  name=f'Khóa {price}', price=price)
+
+    def list_count(self, params):
+        response = self.client.get('/courses/', {key: value for key, value in params.items() if value is not None})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['count']
+
+    def test_price_bucket_counts_match_the_list(self):
+        buckets = self.client.get('/courses/facets/').json()['price_buckets']
+        for bucket in buckets:
+            params = {'min_price': bucket['min_price'], 'max_price': bucket['max_price']}
+            self.assertEqual(bucket['count'], self.list_count(params), bucket)
+        self.assertEqual([bucket['count'] for bucket in buckets], [4, 2, 3, 2])
+
+    def test_boundary_prices_are_inclusive(self):
+        self.assertEqual(self.list_count({'max_price': 1000000}), 5)
+        self.assertEqual(self.list_count({'min_price': 1000000, 'max_price': 2000000}), 3)
+        # Khóa học chưa đặt giá chỉ khớp khi không có giá từ
+        self.assertEqual(self.list_count({'min_price': 0}), 7)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        self.student = User.objects.create(username='student', email='student@example.com')
+        category = Category.objects.create(name='Lập trình')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses = [Course.objects.create(lecturer=self.teacher, category=category, subject='Lập trình',
+                                                  image='course.png', name=f'Khóa {i}') for i in range(3)]
+        RelatedCourse.objects.create(course=self.courses[0], related=self.courses[1], score=0.5, rank=0)
+
+    def assertRevalidates(self, url, change):
+        """A 304 for the current ETag, then a full response once change() ran."""
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_related_courses_follow_enrollments_of_listed_courses(self):
+        url = f'/courses/{self.courses[0].pk}/related/'
+        response = self.assertRevalidates(url, lambda: UserCourse.objects.create(
+            user=self.student, course=self.courses[1], status=CourseStatus.IN_PROGRESS))
+        self.assertEqual(response.json()[0]['total_student'], 1)
+
+    def test_related_courses_follow_rebuilds(self):
+        url = f'/courses/{self.courses[0].pk}/related/'
+        self.assertRevalidates(url, lambda: RelatedCourse.objects.create(
+            course=self.courses[0], related=self.courses[2], score=0.1, rank=1))
+
+    def test_course_list_follows_course_changes(self):
+        def rename():
+            self.courses[2].name = 'Khóa mới'
+            self.courses[2].save()
+        self.assertRevalidates('/courses/', rename)
+
+    def test_course_detail_follows_enrollments(self):
+        self.assertRevalidates(f'/courses/{self.courses[1].pk}/detail/', lambda: UserCourse.objects.create(
+            user=self.student, course=self.courses[1], status=CourseStatus.IN_PROGRESS))
+
+    def test_unknown_courses_do_not_create_version_keys(self):
+        for url in ('/courses/999999/', '/courses/999999/detail/', '/courses/abc/detail/'):
+            self.assertNotEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(cache.get_many([caching.VERSION_KEY.format(name) for name in (
+            students_version_name(999999), course_tree.tree_version_name(999999))]), {})
+
+    def test_course_versions_expire(self):
+        name = course_tree.tree_version_name(self.courses[1].pk)
+        cache.clear()
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            caching.get_versions(name, 'course')
+        self.assertEqual([call.kwargs['timeout'] for call in add.call_args_list],
+                         [settings.OBJECT_VERSION_TIMEOUT, None])
+
+    def test_course_facets_follow_course_changes(self):
+        def reprice():
+            self.courses[0].price = 2500000
+            self.courses[0].save()
+        buckets = self.assertRevalidates('/courses/facets/', reprice).json()['price_buckets']
+        self.assertEqual([bucket['count'] for bucket in buckets if bucket['max_price'] is None], [1])
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        self.students = [User.objects.create(username=f'student{i}', email=f'student{i}@example.com')
+                         for i in range(3)]
+        self.courses = [Course.objects.create(lecturer=self.teacher, subject='Lập trình', image='course.png',
+                                              name=f'Khóa {i}') for i in range(2)]
+
+    def enroll(self, student, course):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserCourse.objects.create(user=student, course=course, status=CourseStatus.IN_PROGRESS)
+
+    def age_board(self, window, seconds):
+        built_at, ranking = cache.get(leaderboard.LEADERBOARD_KEY.format(window))
+        cache.set(leaderboard.LEADERBOARD_KEY.format(window), (built_at - seconds, ranking))
+
+    def test_enrollments_adjust_the_cached_board(self):
+        self.enroll(self.students[0], self.courses[0])
+        self.assertEqual(leaderboard.get_ranking('7d'), [[self.courses[0].pk, 1]])
+        self.enroll(self.students[1], self.courses[0])
+        self.assertEqual(leaderboard.get_ranking('7d'), [[self.courses[0].pk, 2]])
+        self.assertIsNone(cache.get(leaderboard.LEADERBOARD_LOCK_KEY.format('7d')))
+
+    def test_locked_board_is_not_overwritten(self):
+        self.enroll(self.students[0], self.courses[0])
+        leaderboard.get_ranking('7d')
+        cache.add(leaderboard.LEADERBOARD_LOCK_KEY.format('7d'), 1)
+        with mock.patch.object(leaderboard, 'LOCK_WAIT', 0):
+            self.enroll(self.students[1], self.courses[0])
+        self.assertEqual(cache.get(leaderboard.LEADERBOARD_KEY.format('7d'))[1], [[self.courses[0].pk, 1]])
+
+    def test_stale_board_is_served_while_another_request_rebuilds(self):
+        self.enroll(self.students[0], self.courses[0])
+        leaderboard.get_ranking('7d')
+        self.age_board('7d', settings.LEADERBOARD_TIMEOUT)
+        UserCourse.objects.bulk_create([UserCourse(user=student, course=self.courses[1],
+                                                   status=CourseStatus.IN_PROGRESS) for student in self.students])
+        cache.add(leaderboard.LEADERBOARD_REBUILD_KEY.format('7d'), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(leaderboard.get_ranking('7d'), [[self.courses[0].pk, 1]])
+
+        cache.delete(leaderboard.LEADERBOARD_REBUILD_KEY.format('7d'))
+        self.assertEqual(leaderboard.get_ranking('7d'), [[self.courses[1].pk, 3], [self.courses[0].pk, 1]])
+        self.assertIsNone(cache.get(leaderboard.LEADERBOARD_REBUILD_KEY.format('7d')))
+
+
+class LessonProgressDeltaTests(ProgressTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course, self.lessons = self.create_course()
+        self.enroll(self.course)
+
+    def test_updates_match_recount(self):
+        self.update_progress(self.lessons[0], 10, 5)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 0, 10, 0.0))
+        self.update_progress(self.lessons[0], 50, 50)
+        self.update_progress(self.lessons[1], 95, 95)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 1, 145, 25.0))
+        self.update_progress(self.lessons[0], 100, 100)
+        self.update_progress(self.lessons[2], 30, 20)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 2, 225, 50.0))
+
+    def test_repeated_update_does_not_count_twice(self):
+        for _ in range(3):
+            self.update_progress(self.lessons[0], 100, 100)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 1, 100, 25.0))
+
+    def test_stale_instance_is_not_used_for_the_delta(self):
+        self.update_progress(self.lessons[0], 10, 5)
+        stale = LessonProgress.objects.get(user=self.student, lesson=self.lessons[0])
+        self.update_progress(self.lessons[0], 60, 60)
+        # Request sau đọc lại dòng đang lưu (60), không phải bản 10 đã nạp trước đó
+        self.update_progress(self.lessons[0], 100, 100)
+        self.assertEqual(stale.watch_time, 10)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 1, 100, 25.0))
+
+    def test_delete_and_deferred_save_match_recount(self):
+        self.update_progress(self.lessons[0], 100, 100)
+        self.update_progress(self.lessons[1], 40, 40)
+        LessonProgress.objects.get(user=self.student, lesson=self.lessons[0]).delete()
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 0, 40, 0.0))
+        lesson_progress = LessonProgress.objects.only('id', 'user_id').get(user=self.student, lesson=self.lessons[1])
+        lesson_progress.watch_time = 7
+        lesson_progress.save()
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 0, 7, 0.0))
+
+    def test_unpublished_lesson_is_not_counted(self):
+        course, lessons = self.create_course(lessons=2, published=False)
+        self.enroll(course)
+        self.update_progress(lessons[0], 100, 100)
+        self.assertEqual(self.assertMatchesRecount(course), (0, 0, 100, 0.0))
+
+    def test_unpublishing_a_watched_lesson_defers_the_recount(self):
+        self.update_progress(self.lessons[0], 100, 100)
+        lesson = Lesson.objects.get(pk=self.lessons[0].pk)
+        lesson.is_published = False
+        with mock.patch.object(progress, 'recount_course_progress') as recount, \
+                mock.patch.object(progress, '_pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            lesson.save()
+            pool.assert_not_called()
+        recount.assert_not_called()
+        pool.return_value.submit.assert_called_once_with(progress._recount_course_in_background, self.course.pk,
+                                                         progress.COURSE_RECOUNT_LOCK_KEY.format(self.course.pk))
+        # Tổng số bài học được cập nhật ngay, số bài đã hoàn thành sau lần đếm lại
+        self.assertEqual(self.counters(self.course), (3, 1, 100, round(100 / 3, 6)))
+        with mock.patch.object(progress.connections, 'close_all'):
+            progress._recount_course_in_background(self.course.pk,
+                                                   progress.COURSE_RECOUNT_LOCK_KEY.format(self.course.pk))
+        self.assertEqual(self.counters(self.course), (3, 0, 100, 0.0))
+
+
+class CourseProgressReadTests(ProgressTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course, self.lessons = self.create_course()
+        self.enroll(self.course)
+
+    def get_course_progress(self):
+        with mock.patch.object(progress, 'schedule_recount') as schedule_recount:
+            response = self.client.get(f'/lesson-progress/course/{self.course.pk}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), schedule_recount
+
+    def test_missing_course_progress_reports_published_lessons(self):
+        data, schedule_recount = self.get_course_progress()
+        self.assertEqual(data['course_progress']['total_lessons'], 4)
+        schedule_recount.assert_not_called()
+
+    def test_unchanged_heartbeat_keeps_course_progress_fresh(self):
+        self.update_progress(self.lessons[0], 50, 50)
+        self.update_progress(self.lessons[0], 50, 50)
+        _, schedule_recount = self.get_course_progress()
+        schedule_recount.assert_not_called()
+
+
+class HeartbeatWriteTests(ProgressTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course, self.lessons = self.create_course()
+        self.enroll(self.course)
+
+    def heartbeat(self, lesson, watch_time, percentage):
+        return {'lesson_id': lesson.pk, 'watch_time': watch_time, 'completion_percentage': percentage,
+                'client_ts': None}
+
+    def test_row_created_concurrently_is_updated(self):
+        LessonProgress.objects.create(user=self.student, lesson=self.lessons[0], watch_time=5)
+        select_for_update = LessonProgress.objects.select_for_update
+        calls = []
+
+        def first_read_misses_the_row():
+            # Lần đọc đầu chưa thấy dòng do request khác tạo: bulk_create gặp IntegrityError
+            calls.append(1)
+            queryset = select_for_update()
+            return queryset.none() if len(calls) == 1 else queryset
+
+        with mock.patch.object(LessonProgress.objects, 'select_for_update', first_read_misses_the_row):
+            progress.apply_heartbeats(self.student.pk, [self.heartbeat(self.lessons[0], 100, 100),
+                                                        self.heartbeat(self.lessons[1], 30, 30)])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(LessonProgress.objects.filter(user=self.student).count(), 2)
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 1, 130, 25.0))
+
+
+@override_settings(PROGRESS_WRITE_BEHIND='local')
+class ProgressBufferFlushTests(ProgressTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        progress_buffer._buffers.clear()
+        self.course, self.lessons = self.create_course()
+        self.enroll(self.course)
+
+    def buffer(self, user, lesson, watch_time, percentage, received_at=None):
+        progress_buffer.get_buffer().push(user.pk, [{
+            'lesson_id': lesson.pk, 'watch_time': watch_time, 'completion_percentage': percentage,
+            'client_ts': None, 'received_at': received_at or timezone.now(),
+        }])
+
+    def test_older_buffered_heartbeat_does_not_overwrite_direct_write(self):
+        received_at = timezone.now()
+        self.update_progress(self.lessons[0], 70, 70)
+        # Heartbeat nhận trước lần ghi trực tiếp, được trả lại bộ đệm sau một lần flush lỗi
+        self.buffer(self.student, self.lessons[0], 20, 20, received_at)
+        progress_buffer.flush()
+        lesson_progress = LessonProgress.objects.get(user=self.student, lesson=self.lessons[0])
+        self.assertEqual((lesson_progress.watch_time, lesson_progress.completion_percentage), (70, 70))
+        self.assertMatchesRecount(self.course)
+
+    def test_buffered_heartbeat_does_not_lower_status(self):
+        self.update_progress(self.lessons[0], 100, 100)
+        self.buffer(self.student, self.lessons[0], 10, 10)
+        progress_buffer.flush()
+        lesson_progress = LessonProgress.objects.get(user=self.student, lesson=self.lessons[0])
+        self.assertEqual((lesson_progress.status, lesson_progress.watch_time), ('COMPLETED', 10))
+        self.assertEqual(self.assertMatchesRecount(self.course), (4, 1, 10, 25.0))
+
+    def test_failed_user_is_restored_and_others_written(self):
+        other = User.objects.create(username='other', email='other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            UserCourse.objects.create(user=other, course=self.course, status=CourseStatus.IN_PROGRESS)
+        self.buffer(self.student, self.lessons[0], 30, 30)
+        self.buffer(other, self.lessons[0], 40, 40)
+        apply_heartbeats = progress.apply_heartbeats
+
+        def fail_for_student(user_id, heartbeats):
+            if user_id == self.student.pk:
+                raise RuntimeError('database unavailable')
+            return apply_heartbeats(user_id, heartbeats)
+
+        with mock.patch.object(progress, 'apply_heartbeats', fail_for_student), \
+                self.assertLogs('courses.services.progress_buffer', 'ERROR'):
+            self.assertEqual(progress_buffer.flush(), (1, 1))
+        self.assertEqual(LessonProgress.objects.get(user=other).watch_time, 40)
+        self.assertEqual(progress_buffer.flush(), (1, 1))
+        self.assertEqual(LessonProgress.objects.get(user=self.student).watch_time, 30)
+
+
+class StreamingChunkTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='student', email='student@example.com')
+        forum = Forum.objects.create(user=user, name='Diễn đàn')
+        activity = timezone.now()
+        # Trùng giá trị sắp xếp để chunk phải phân biệt bằng pk
+        for i in range(9):
+            topic = Topic.objects.create(forum=forum, user=user, title=f'Chủ đề {i}', is_pinned=i % 3 == 0)
+            Topic.objects.filter(pk=topic.pk).update(last_activity=activity - timezone.timedelta(minutes=i % 2))
+        for i in range(7):
+            Comment.objects.create(forum=forum, user=user, content=f'Bình luận {i}')
+        Comment.objects.filter(pk__in=Comment.objects.order_by('pk').values('pk')[:2]).update(created_at=None)
+        Comment.objects.filter(content__in=['Bình luận 3', 'Bình luận 4']).update(created_at=activity)
+
+    def assertChunksFollowOrder(self, queryset, chunk_size=2):
+        chunks = list(iter_chunks(queryset, chunk_size))
+        self.assertTrue(all(0 < len(chunk) <= chunk_size for chunk in chunks))
+        self.assertEqual([obj.pk for chunk in chunks for obj in chunk],
+                         list(queryset.order_by(*queryset.query.order_by or queryset.model._meta.ordering, 'pk')
+                              .values_list('pk', flat=True)))
+
+    def test_default_ordering_is_chunked_by_keyset(self):
+        queryset = Topic.objects.all()
+        with self.assertNumQueries(6):
+            self.assertEqual(sum(len(chunk) for chunk in iter_chunks(queryset, 2)), 9)
+        self.assertChunksFollowOrder(queryset)
+
+    def test_nullable_ordering_columns(self):
+        self.assertChunksFollowOrder(Comment.objects.all())
+        self.assertChunksFollowOrder(Comment.objects.order_by('-created_at'), chunk_size=3)
+
+    def test_orderings_without_keyset_keep_their_order(self):
+        self.assertChunksFollowOrder(Topic.objects.order_by('user__username', 'title'))
+
+
+class CatalogImportTests(ProgressTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Category.objects.create(name='Lập trình')
+        # Nạp sẵn lesson map và chỉ mục gợi ý: import phải làm mới các bản đã có
+        lesson_map.get_lesson_map()
+        suggest.suggest('python')
+        record = {
+            'ref': 'rust-101', 'category': 'Lập trình', 'lecturer': 'teacher', 'name': 'Rust cơ bản',
+            'subject': 'Lập trình hệ thống', 'image': 'rust.png', 'price': '500000',
+            'chapters': [{
+                'name': 'Chương 1', 'is_published': True,
+                'lessons': [{'name': f'Bài {i}', 'duration': 120, 'is_published': i < 3} for i in range(4)],
+            }],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = catalog_io.CatalogImporter().run([record])
+        self.assertEqual(stats.courses, 1)
+        self.course = Course.objects.get(import_ref='rust-101')
+        self.lessons = list(Lesson.objects.filter(chapter__course=self.course).order_by('pk'))
+
+    def test_lines_that_are_not_objects_are_reported_per_line(self):
+        lines = ['[1, 2]', '"rust"', '{broken', json.dumps({'ref': 'go-101', 'chapters': 'Chương 1'}),
+                 json.dumps({'ref': 'go-102', 'name': 'Go cơ bản', 'subject': 'Lập trình', 'image': 'go.png'})]
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = catalog_io.CatalogImporter().run(catalog_io.read_jsonl_records(lines))
+        self.assertEqual((stats.records, stats.courses, stats.failed), (5, 1, 4))
+        self.assertEqual([error['ref'] for error in stats.errors], ['line-1', 'line-2', 'line-3', 'go-101'])
+        self.assertEqual(stats.errors[0]['detail'], 'Expected a JSON object, got list')
+        self.assertTrue(Course.objects.filter(import_ref='go-102').exists())
+
+    def test_lesson_map_knows_imported_lessons(self):
+        info = lesson_map.lesson_info(self.lessons[0].pk)
+        self.assertEqual((info.course_id, info.duration, info.is_published), (self.course.pk, 120, True))
+        self.assertFalse(lesson_map.lesson_info(self.lessons[3].pk).is_published)
+
+    def test_course_totals_and_teacher_stats(self):
+        self.assertEqual((self.course.published_lesson_count, self.course.total_duration), (3, 360))
+        self.assertEqual(TeacherStats.objects.get(teacher=self.teacher).course_count, 1)
+
+    def test_suggest_index_finds_imported_course(self):
+        self.assertEqual(suggest.suggest('rust')[0], {'type': 'course', 'id': self.course.pk, 'label': 'Rust cơ bản'})
+
+    def test_progress_of_imported_lesson(self):
+        self.enroll(self.course)
+        self.update_progress(self.lessons[0], 120, 100)
+        self.update_progress(self.lessons[3], 60, 100)
+        with mock.patch.object(progress, 'schedule_recount'):
+            response = self.client.get(f'/lesson-progress/course/{self.course.pk}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        course_progress = response.json()['course_progress']
+        self.assertEqual((course_progress['total_lessons'], course_progress['completed_lessons']), (3, 1))
+        self.assertEqual(self.assertMatchesRecount(self.course), (3, 1, 180, round(100 / 3, 6)))
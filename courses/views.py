@@ -1,4 +1,3 @@
-from django.db.models import Count
 from rest_framework import viewsets, generics, status, parsers, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -6,27 +5,69 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 import hmac, hashlib
 from courses.models import Category, Course, User, Role, UserCourse, Forum, Comment, Chapter, Lesson, CourseStatus, \
-    Payment, PaymentStatus, Topic, LessonProgress, LessonProgressStatus, CourseProgress
-from .perms import IsAdmin, IsStudent, IsTeacher, IsTeacherOrAdmin
+    Payment, PaymentStatus, Topic, LessonProgress, CourseProgress, RelatedCourse
+from .perms import IsAdmin, IsCourseLecturerOrAdmin, IsStudent, IsTeacher, IsTeacherOrAdmin
 from .services.momo import create_momo_payment, update_status_user_course
+from .services import caching, catalog_io, course_tree, enrollment, funnel, leaderboard, lesson_map, progress, progress_buffer, related, suggest
+from .services.enrollment import students_version_name
 from rest_framework.exceptions import PermissionDenied
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import DecimalField, Prefetch, Value
+from django.db.models.functions import Coalesce
 from courses import serializers, paginators
+from courses.filters import CATALOG_FILTERS, course_facets, filter_courses
+from courses.search import search_courses
+from courses.streaming import StreamingListMixin
+from django.conf import settings
 from django.core.cache import cache
 from django.core.mail import send_mail
+from django.http import StreamingHttpResponse
+import codecs
 import random
 
 
-class CategoryViewSet(viewsets.ViewSet, generics.ListAPIView):
+class CategoryViewSet(StreamingListMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Category.objects.filter(active=True)
     serializer_class = serializers.CategorySerializer
 
+    @caching.conditional_get(('category',))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class TeacherViewSet(viewsets.ViewSet, generics.ListAPIView):
-    queryset = User.objects.filter(userRole__name="Teacher")
+    queryset = User.objects.filter(userRole__name="Teacher").annotate(
+        course_count=Coalesce('teacher_stats__course_count', 0),
+        total_students=Coalesce('teacher_stats__student_count', 0),
+        average_price=Coalesce('teacher_stats__average_price', Value(0, output_field=DecimalField())),
+    ).order_by('id')
     serializer_class = serializers.TeacherSerializer
+    pagination_class = paginators.TeacherPagination
+
+    @caching.conditional_get(('user', 'course', 'user_course'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+# Dữ liệu xuất hiện trong /courses/: đổi bất kỳ bảng nào cũng làm mới toàn bộ cache danh sách
+COURSE_LIST_VERSIONS = ('course', 'category', 'user_course', 'user')
+COURSE_FACET_VERSIONS = ('course', 'category')
+
+
+def _course_object_versions(pk, *names):
+    return caching.object_versions(names, lambda: str(pk).isdigit() and Course.objects.filter(pk=pk).exists())
+
+
+def course_versions(kwargs):
+    return 'course', 'category', 'user', *_course_object_versions(kwargs['pk'], students_version_name(kwargs['pk']))
+
+
+def course_tree_versions(kwargs):
+    # Khóa học không tồn tại: ETag theo bảng course (đổi khi pk đó được tạo), không tạo key version cho pk
+    return _course_object_versions(kwargs['pk'], course_tree.tree_version_name(kwargs['pk']),
+                                   students_version_name(kwargs['pk'])) or ('course',)
 
 
 class CourseViewSet(viewsets.ModelViewSet):
@@ -35,6 +76,10 @@ class CourseViewSet(viewsets.ModelViewSet):
     pagination_class = paginators.CoursePagination
 
     def get_permissions(self):
+        if self.action in ('export_catalog', 'import_catalog'):
+            return [IsAdmin()]
+        if self.action == 'get_funnel':
+            return [IsCourseLecturerOrAdmin()]
         if self.request.method in ('POST', 'PUT', 'PATCH', 'DELETE'):
             return [IsTeacherOrAdmin()]
         return [permissions.AllowAny()]
@@ -42,33 +87,112 @@ class CourseViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(lecturer=self.request.user)
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        request = self.request
-
-        lecturer_id = request.query_params.get('lecturer')
-        category_id = request.query_params.get('category')
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        level = request.query_params.get('level')
-
-        if lecturer_id:
-            queryset = queryset.filter(lecturer_id=lecturer_id)
-
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-
-        if level:
-            queryset = queryset.filter(level=level)
+    @property
+    def paginator(self):
+        # ?pagination=cursor: phân trang keyset, không COUNT/OFFSET
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = paginators.CourseCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
+    def get_queryset(self):
+        queryset = filter_courses(super().get_queryset(), self.request.query_params)
+        if self.action == 'get_course_detail':
+            # Cây nội dung thường đã có trong cache: chỉ kiểm tra khóa học tồn tại và đọc số học viên
+            queryset = queryset.only('pk', 'active', 'student_count')
+        elif self.action in ('list', 'retrieve', 'search'):
+            queryset = serializers.sparse_queryset(queryset.select_related('lecturer', 'category'),
+                                                   self.get_serializer())
         return queryset
 
+    @caching.conditional_get(COURSE_LIST_VERSIONS)
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        key = caching.versioned_key('course-list', COURSE_LIST_VERSIONS, request.get_host(),
+                                    caching.normalize_query(request.query_params))
+        return caching.cached_json_response(key, lambda: super(CourseViewSet, self).list(request, *args, **kwargs).data,
+                                            settings.COURSE_LIST_CACHE_TIMEOUT)
+
+    @caching.conditional_get(course_versions)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(methods=['get'], detail=False, url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        courses = search_courses(self.get_queryset(), query)
+        # Giữ thứ tự theo độ liên quan nên luôn phân trang theo số trang
+        paginator = paginators.CoursePagination()
+        page = paginator.paginate_queryset(courses, request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(methods=['get'], detail=False, url_path='facets')
+    @caching.conditional_get(COURSE_FACET_VERSIONS)
+    def facets(self, request):
+        params = {name: request.query_params.get(name) for name in CATALOG_FILTERS}
+        key = caching.versioned_key('course-facets', COURSE_FACET_VERSIONS, caching.normalize_query(params))
+        return caching.cached_json_response(key, lambda: course_facets(Course.objects.filter(active=True), params),
+                                            settings.COURSE_LIST_CACHE_TIMEOUT)
+
+    @action(methods=['get'], detail=False, url_path='suggest')
+    def get_suggestions(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(suggest.suggest(request.query_params.get('q', ''), limit), status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=True, url_path='related')
+    @caching.conditional_get(('course', 'category', 'user'), validator=related.etag_validator)
+    def get_related_courses(self, request, pk=None):
+        # Đọc top-K đã tính sẵn bởi lệnh build_related_courses
+        rows = RelatedCourse.objects.filter(course_id=pk, related__active=True) \
+            .select_related('related__lecturer', 'related__category').order_by('rank')
+        courses = [row.related for row in rows]
+        data = self.get_serializer(courses, many=True).data
+        for item, row in zip(data, rows):
+            item['score'] = round(row.score, 4)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=True, url_path='analytics/funnel')
+    def get_funnel(self, request, pk=None):
+        course = self.get_object()
+        # Khóa học lớn đã được tính sẵn bởi lệnh precompute_funnels, còn lại tính khi cần và cache ngắn hạn
+        return caching.cached_json_response(funnel.funnel_key(course.pk), lambda: funnel.compute_funnel(course.pk),
+                                            settings.FUNNEL_CACHE_TIMEOUT)
+
+    @action(methods=['get'], detail=False, url_path='export')
+    def export_catalog(self, request):
+        # ?file_format=: tham số ?format= đã được DRF dùng để chọn renderer
+        file_format = request.query_params.get('file_format', 'jsonl')
+        if file_format not in catalog_io.FORMATS:
+            return Response({"detail": "file_format phải là jsonl hoặc csv."}, status=status.HTTP_400_BAD_REQUEST)
+        lines = catalog_io.export_lines(catalog_io.iter_course_records(), file_format)
+        response = StreamingHttpResponse(
+            lines, content_type='text/csv' if file_format == 'csv' else 'application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="courses.{file_format}"'
+        return response
+
+    @action(methods=['post'], detail=False, url_path='import', parser_classes=[parsers.MultiPartParser])
+    def import_catalog(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Thiếu file import."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or catalog_io.format_for(upload.name)
+        if file_format not in catalog_io.FORMATS:
+            return Response({"detail": "file_format phải là jsonl hoặc csv."}, status=status.HTTP_400_BAD_REQUEST)
+        # Đọc file theo dòng, import từng lô khóa học; bản ghi đã import (cùng ref) được bỏ qua
+        records = catalog_io.read_records(codecs.iterdecode(upload, 'utf-8'), file_format)
+        stats = catalog_io.CatalogImporter().run(records)
+        return Response(stats.as_dict(), status=status.HTTP_200_OK)
+
     @action(methods=['get'], detail=True, url_path='forum')
     def get_forum(self, request, pk=None):
         course = self.get_object()
@@ -81,7 +205,8 @@ class CourseViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=False, url_path='my-course', permission_classes=[permissions.IsAuthenticated])
     def get_my_course(self, request, pk=None):
         user = request.user
-        query = Course.objects.filter(lecturer=user)
+        query = serializers.sparse_queryset(Course.objects.filter(lecturer=user).select_related('lecturer', 'category'),
+                                            self.get_serializer())
 
         page = self.paginate_queryset(query)
         if page is not None:  # <-- kiểm tra ở đây
@@ -94,20 +219,31 @@ class CourseViewSet(viewsets.ModelViewSet):
 
     @action(methods=['get'], detail=False, url_path='top')
     def get_courses_top(self, request, pk=None):
-        top_courses = Course.objects.annotate(student_count=Count('user_course')).order_by('-student_count')[:3]
+        window = request.query_params.get('window', 'all')
+        if window not in leaderboard.WINDOWS:
+            return Response({"detail": "window must be one of: " + ", ".join(leaderboard.WINDOWS)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 3))
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.LEADERBOARD_SIZE))
+
+        top_courses = leaderboard.top_courses(window, limit)
         return Response(serializers.CourseSerializer(top_courses, many=True).data, status=status.HTTP_200_OK)
 
     @action(methods=['get'], detail=True, url_path='detail')
+    @caching.conditional_get(course_tree_versions)
     def get_course_detail(self, request, pk=None):
         try:
             course = self.get_object()
-            # Optimize queries with select_related and prefetch_related
-            course = Course.objects.select_related('lecturer', 'lecturer__userRole').prefetch_related(
-                'chapters__lessons__documents'
-            ).get(pk=pk)
-
-            serializer = serializers.CourseDetailSerializer(course)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # Giảng viên được nạp cùng khóa học khi phải dựng lại cây
+            data = course_tree.get_course_tree(course, lambda: Course.objects.select_related(
+                'lecturer', 'lecturer__userRole').get(pk=course.pk))
+            # ?fields= / ?omit= chỉ lọc trên cây đã cache, dòng khóa học được nạp theo pk
+            selected = serializers.CourseDetailSerializer(context={'request': request}).fields
+            return Response({name: value for name, value in data.items() if name in selected},
+                            status=status.HTTP_200_OK)
         except Course.DoesNotExist:
             return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -208,15 +344,16 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView):
         return Response(serializers.UserSerializer(user).data)
 
 
-class UserCourseViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
+class UserCourseViewSet(StreamingListMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
     serializer_class = serializers.UserCourseSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
+        queryset = UserCourse.objects.select_related('user', 'course__lecturer', 'course__category')
         if IsAdmin().has_permission(self.request, self):
-            return UserCourse.objects.all()
-        return UserCourse.objects.filter(user=user)
+            return queryset.all()
+        return queryset.filter(user=user)
 
 
     @action(methods=['post'], detail=False, url_path='create', permission_classes=[IsStudent])
@@ -301,34 +438,28 @@ class CanAccessForum(permissions.BasePermission):
             return True
             
         # Student có quyền truy cập forum của khóa học đã đăng ký
-        if obj.course:
-            return UserCourse.objects.filter(
-                user=user,
-                course=obj.course,
-                status__in=[CourseStatus.IN_PROGRESS, CourseStatus.COMPLETE]
-            ).exists()
+        if obj.course_id:
+            return enrollment.is_enrolled(user.id, obj.course_id)
             
         return False
 
-class ForumViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
+class ForumViewSet(StreamingListMixin, viewsets.ViewSet, generics.ListCreateAPIView):
     serializer_class = serializers.ForumSerializer
     permission_classes = [CanAccessForum]
 
     def get_queryset(self):
         user = self.request.user
+        forums = Forum.objects.select_related('user', 'course')
         if IsTeacher().has_permission(self.request, self):
-            return Forum.objects.filter(user=user)
+            return forums.filter(user=user)
         elif IsAdmin().has_permission(self.request, self):
-            return Forum.objects.all()
+            return forums.all()
         else:
-            # Lấy danh sách các khóa học mà user đã đăng ký
-            enrolled_courses = UserCourse.objects.filter(
-                user=user,
-                status__in=[CourseStatus.IN_PROGRESS, CourseStatus.COMPLETE]  # Chỉ khóa học đang học hoặc đã hoàn thành
-            ).values_list('course', flat=True)
-            
+            # Lấy danh sách các khóa học mà user đã đăng ký (chỉ khóa học đang học hoặc đã hoàn thành)
+            enrolled_courses = enrollment.enrolled_course_ids(user.id)
+
             # Trả về forums của các khóa học đã đăng ký
-            return Forum.objects.filter(course__in=enrolled_courses)
+            return forums.filter(course__in=enrolled_courses)
 
     @swagger_auto_schema(
         operation_summary="Tạo forum mới",
@@ -351,7 +482,7 @@ class ForumViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
         
         serializer.save(user=self.request.user)
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = serializers.TopicSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -404,7 +535,7 @@ class TopicViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = serializers.CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -440,7 +571,10 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return LessonProgress.objects.filter(user=self.request.user)
+        queryset = LessonProgress.objects.filter(user=self.request.user).select_related('lesson')
+        if self.action in ('list', 'retrieve'):
+            queryset = serializers.sparse_queryset(queryset, self.get_serializer())
+        return queryset
 
     @swagger_auto_schema(
         operation_summary="Cập nhật tiến độ học bài",
@@ -485,47 +619,68 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
         if not lesson_id:
             return Response({"error": "lesson_id is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            lesson = Lesson.objects.get(id=lesson_id)
-        except Lesson.DoesNotExist:
+        # Tra chương / khóa học của bài học từ lesson map, không nạp Lesson và Chapter
+        lesson = lesson_map.lesson_info(lesson_id)
+        if lesson is None:
             return Response({"error": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
         
         # Check if user is enrolled in the course
-        user_course = UserCourse.objects.filter(
-            user=request.user,
-            course=lesson.chapter.course,
-            status=CourseStatus.IN_PROGRESS
-        ).first()
-        
-        if not user_course:
+        if not enrollment.is_enrolled(request.user.id, lesson.course_id, [CourseStatus.IN_PROGRESS]):
             return Response({"error": "You are not enrolled in this course"}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get or create lesson progress
-        lesson_progress, created = LessonProgress.objects.get_or_create(
-            user=request.user,
-            lesson=lesson
-        )
-        
         # Determine progress status based on completion percentage
-        if completion_percentage >= 90:
-            progress_status = LessonProgressStatus.COMPLETED
-        elif completion_percentage > 0:
-            progress_status = LessonProgressStatus.IN_PROGRESS
-        else:
-            progress_status = LessonProgressStatus.NOT_STARTED
+        progress_status = progress.status_for_percentage(completion_percentage)
         
-        # Update progress
-        serializer = serializers.LessonProgressUpdateSerializer(lesson_progress, data={
-            'status': progress_status,
-            'watch_time': watch_time,
-            'completion_percentage': completion_percentage
-        })
-        
-        if serializer.is_valid():
+        # Khóa dòng tiến độ như write_heartbeats: delta cộng vào CourseProgress tính từ giá trị đang lưu,
+        # hai request đồng thời không được cùng đọc một giá trị cũ
+        with transaction.atomic():
+            lesson_progress, created = LessonProgress.objects.select_for_update().get_or_create(
+                user=request.user,
+                lesson_id=int(lesson_id)
+            )
+            
+            # Update progress
+            serializer = serializers.LessonProgressUpdateSerializer(lesson_progress, data={
+                'status': progress_status,
+                'watch_time': watch_time,
+                'completion_percentage': completion_percentage
+            })
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             serializer.save()
-            return Response(serializers.LessonProgressSerializer(lesson_progress).data, status=status.HTTP_200_OK)
+        
+        progress_buffer.discard(request.user.id, [lesson_progress.lesson_id])
+        return Response(serializers.LessonProgressSerializer(lesson_progress).data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Cập nhật tiến độ nhiều bài học",
+        operation_description="Gộp các heartbeat của trình phát video: mỗi bài học giữ bản mới nhất theo client_ts. "
+                              "Khi bật bộ đệm ghi sau, heartbeat chưa hoàn thành bài học được ghi xuống DB "
+                              "sau vài giây (danh sách 'buffered')",
+        request_body=serializers.LessonProgressBatchSerializer,
+        responses={
+            200: openapi.Response(description="Cập nhật thành công"),
+            400: openapi.Response(description="Dữ liệu không hợp lệ")
+        }
+    )
+    @action(methods=['post'], detail=False, url_path='batch')
+    def update_lesson_progress_batch(self, request):
+        serializer = serializers.LessonProgressBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        updates = serializer.validated_data['updates']
+        if progress_buffer.get_buffer() is not None:
+            processed, rejected, buffered, course_ids = progress_buffer.buffer_heartbeats(request.user.id, updates)
         else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            (processed, rejected, course_ids), buffered = progress.apply_heartbeats(request.user.id, updates), []
+        course_progresses = CourseProgress.objects.filter(user=request.user, course_id__in=course_ids) \
+            .select_related('course')
+        return Response({
+            'processed': processed,
+            'rejected': rejected,
+            'buffered': buffered,
+            'course_progress': serializers.CourseProgressSerializer(course_progresses, many=True).data
+        }, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
         operation_summary="Lấy tiến độ khóa học",
@@ -565,36 +720,36 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
     def get_course_progress(self, request, course_id=None):
         """Get progress for all lessons in a course"""
         try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
+            course_id = int(course_id)
+        except ValueError:
             return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
         
         # Check if user is enrolled
-        user_course = UserCourse.objects.filter(
-            user=request.user,
-            course=course,
-            status=CourseStatus.IN_PROGRESS
-        ).first()
-        
-        if not user_course:
+        if not enrollment.is_enrolled(request.user.id, course_id, [CourseStatus.IN_PROGRESS]):
+            if not Course.objects.filter(id=course_id).exists():
+                return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
             return Response({"error": "You are not enrolled in this course"}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get course progress
-        course_progress, created = CourseProgress.objects.get_or_create(
+        # Chỉ đọc: CourseProgress được cộng dồn theo delta, nếu bị lệch thì đếm lại ở luồng nền
+        context = {'request': request}
+        course_progress = CourseProgress.objects.filter(user=request.user, course_id=course_id) \
+            .select_related('course').first()
+        lesson_progresses = list(serializers.sparse_queryset(LessonProgress.objects.filter(
             user=request.user,
-            course=course
-        )
-        course_progress.update_progress()
+            lesson__chapter__course_id=course_id
+        ).select_related('lesson', 'lesson__chapter'), serializers.LessonProgressSerializer(context=context),
+            extra=['updated_at']))
         
-        # Get lesson progress for all lessons in the course
-        lesson_progresses = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__chapter__course=course
-        ).select_related('lesson', 'lesson__chapter')
+        if course_progress is None:
+            course = Course.objects.get(id=course_id)
+            course_progress = CourseProgress(user=request.user, course=course,
+                                             total_lessons=course.published_lesson_count)
+        if progress.is_stale(course_progress, lesson_progresses):
+            progress.schedule_recount(request.user.id, course_id)
         
         return Response({
-            'course_progress': serializers.CourseProgressSerializer(course_progress).data,
-            'lesson_progresses': serializers.LessonProgressSerializer(lesson_progresses, many=True).data
+            'course_progress': serializers.CourseProgressSerializer(course_progress, context=context).data,
+            'lesson_progresses': serializers.LessonProgressSerializer(lesson_progresses, many=True, context=context).data
         }, status=status.HTTP_200_OK)
 
 
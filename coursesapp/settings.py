@@ -85,6 +85,55 @@ CACHES = {
     }
 }
 
+# Thời gian cache (giây) của response /courses/, bị vô hiệu sớm hơn khi version thay đổi
+COURSE_LIST_CACHE_TIMEOUT = 300
+# Cây nội dung khóa học được đánh version theo từng khóa học nên có thể giữ lâu
+COURSE_TREE_CACHE_TIMEOUT = 60 * 60 * 24
+# Key version theo từng đối tượng (cây nội dung, học viên của một khóa học) hết hạn sau thời gian này
+OBJECT_VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+# Bảng xếp hạng khóa học: số khóa học giữ trong mỗi bảng và chu kỳ dựng lại (giây)
+LEADERBOARD_SIZE = 50
+LEADERBOARD_TIMEOUT = 600
+# Thời gian bảng đã cũ vẫn được phục vụ trong lúc một request dựng lại
+LEADERBOARD_STALE_TIMEOUT = 60 * 60
+
+# Số khóa học liên quan lưu cho mỗi khóa học (lệnh build_related_courses)
+RELATED_COURSES_TOP_K = 10
+
+# Snapshot chỉ mục gợi ý tìm kiếm dùng chung giữa các worker, được vá dần theo signal
+SUGGEST_INDEX_TIMEOUT = 60 * 60
+
+# Bảng tra bài học -> chương / khóa học dùng khi cập nhật tiến độ, đánh version theo thay đổi Lesson / Chapter
+LESSON_MAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Danh sách khóa học đã đăng ký của từng user (kiểm tra quyền), bị xóa khi UserCourse thay đổi
+ENROLLMENT_CACHE_TIMEOUT = 60 * 60
+
+# Số luồng nền đếm lại CourseProgress bị lệch (phát hiện khi đọc tiến độ khóa học)
+PROGRESS_RECOUNT_WORKERS = 2
+
+# Phễu hoàn thành bài học (/courses/{id}/analytics/funnel/): cache ngắn, khóa học lớn được tính sẵn mỗi đêm
+FUNNEL_CACHE_TIMEOUT = 300
+FUNNEL_PRECOMPUTED_TIMEOUT = 60 * 60 * 26
+FUNNEL_PRECOMPUTE_MIN_LEARNERS = 1000
+
+# Có REDIS_URL: cache mặc định dùng chung giữa các worker và các lệnh chạy nền (cron, pm2), cần cho
+# version, bảng xếp hạng, phễu và chỉ mục gợi ý được dựng sẵn. Không có: LocMem, chỉ dùng khi phát triển.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES['default'] = {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+    CACHES['progress'] = CACHES['default']
+
+# Bộ đệm ghi sau cho heartbeat tiến độ: 'redis' (cache PROGRESS_BUFFER_CACHE), 'local' (trong một process,
+# dùng khi test) hoặc None để ghi thẳng xuống DB. Lệnh flush_progress_buffer ghi dữ liệu theo chu kỳ.
+PROGRESS_WRITE_BEHIND = 'redis' if REDIS_URL else None
+PROGRESS_BUFFER_CACHE = 'progress'
+PROGRESS_FLUSH_INTERVAL = 10
+
 OAUTH2_PROVIDER = {'SCOPES': {'read': 'Read scope', 'write': 'Write scope', }}
 REST_FRAMEWORK = {'DEFAULT_AUTHENTICATION_CLASSES': (
     'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
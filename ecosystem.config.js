@@ -12,6 +12,48 @@ module.exports = {
                 DJANGO_SETTINGS_MODULE: "coursesapp.settings",
                 PYTHONUNBUFFERED: "1"
             }
+        },
+        {
+            // Ghi heartbeat tiến độ từ Redis xuống MySQL theo chu kỳ (chỉ khi có REDIS_URL).
+            // Không có REDIS_URL thì lệnh thoát với mã 0 và pm2 không khởi động lại
+            name: "progress-flusher",
+            script: "manage.py",
+            args: "flush_progress_buffer --interval 10",
+            interpreter: "/home/truong/course-be/Courses-Online-Api/venv/bin/python3",
+            cwd: "/home/truong/course-be/Courses-Online-Api",
+            stop_exit_codes: [0],
+            env: {
+                DJANGO_SETTINGS_MODULE: "coursesapp.settings",
+                PYTHONUNBUFFERED: "1"
+            }
+        },
+        {
+            // Tính sẵn phễu hoàn thành bài học của các khóa học lớn lúc 2h sáng
+            name: "precompute-funnels",
+            script: "manage.py",
+            args: "precompute_funnels",
+            interpreter: "/home/truong/course-be/Courses-Online-Api/venv/bin/python3",
+            cwd: "/home/truong/course-be/Courses-Online-Api",
+            cron_restart: "0 2 * * *",
+            autorestart: false,
+            env: {
+                DJANGO_SETTINGS_MODULE: "coursesapp.settings",
+                PYTHONUNBUFFERED: "1"
+            }
+        },
+        {
+            // Dựng lại bảng xếp hạng khóa học mỗi 10 phút (LEADERBOARD_TIMEOUT) để request không phải tự dựng
+            name: "rebuild-leaderboard",
+            script: "manage.py",
+            args: "rebuild_leaderboard",
+            interpreter: "/home/truong/course-be/Courses-Online-Api/venv/bin/python3",
+            cwd: "/home/truong/course-be/Courses-Online-Api",
+            cron_restart: "*/10 * * * *",
+            autorestart: false,
+            env: {
+                DJANGO_SETTINGS_MODULE: "coursesapp.settings",
+                PYTHONUNBUFFERED: "1"
+            }
         }
     ]
 };